@@ -9,6 +9,7 @@ import {
   type ParsedRetrait,
   type ParsedNonRenouvele,
 } from '@/lib/excel-parser'
+import { searchKeys } from '@/lib/phonetic'
 
 // Augmenter la limite de taille du body pour les fichiers Excel volumineux
 export const maxDuration = 60 // secondes (Vercel Pro/hobby = 10s max en Edge)
@@ -31,6 +32,25 @@ async function ensureArchiveColumns(client: any) {
   `)
 }
 
+async function ensureSearchKeyColumns(client: any) {
+  // Clés de la recherche tolérante aux fautes (sql/07_phonetic_search.sql)
+  for (const table of ['enregistrements', 'retraits', 'non_renouveles']) {
+    await client.query(`
+      ALTER TABLE ${table}
+        ADD COLUMN IF NOT EXISTS nom_marque_phon TEXT,
+        ADD COLUMN IF NOT EXISTS dci_phon        TEXT,
+        ADD COLUMN IF NOT EXISTS search_tokens   TEXT[]
+    `)
+  }
+}
+
+function placeholderRows(batchLength: number, width: number): string {
+  return Array.from({ length: batchLength }, (_, bi) => {
+    const cols = Array.from({ length: width }, (_, ci) => `$${bi * width + ci + 1}`)
+    return `(${cols.join(',')})`
+  }).join(',')
+}
+
 async function getCurrentEnregistrementKeys(client: any): Promise<Set<string>> {
   const { rows } = await client.query(`
     SELECT n_enreg, code, dci, nom_marque, dosage FROM enregistrements
@@ -123,6 +143,7 @@ export async function POST(req: NextRequest) {
 
     // S'assurer que les colonnes d'archive existent
     await ensureArchiveColumns(client)
+    await ensureSearchKeyColumns(client)
 
     // Calculer les statistiques AVANT d'écraser les données
     const existingKeys = await getCurrentEnregistrementKeys(client)
@@ -159,20 +180,19 @@ export async function POST(req: NextRequest) {
       currentYear,
       versionLabel,
       !existingKeys.has(identityKey(r)),  // is_new_vs_previous
+      ...searchKeys(r.nom_marque, r.dci),
     ])
 
-    // Insert par lots de 200 lignes (20 colonnes × 200 = 4000 params, < limite pg 65535)
+    // Insert par lots de 200 lignes (23 colonnes × 200 = 4600 params, < limite pg 65535)
     for (let i = 0; i < enregRows.length; i += 200) {
       const batch = enregRows.slice(i, i + 200)
-      const placeholders = batch.map((_, bi) => {
-        const base = bi * 20
-        return `($${base+1},$${base+2},$${base+3},$${base+4},$${base+5},$${base+6},$${base+7},$${base+8},$${base+9},$${base+10},$${base+11},$${base+12},$${base+13},$${base+14},$${base+15},$${base+16},$${base+17},$${base+18},$${base+19},$${base+20})`
-      }).join(',')
+      const placeholders = placeholderRows(batch.length, 23)
       await client.query(
         `INSERT INTO enregistrements
          (n_enreg, code, dci, nom_marque, forme, dosage, conditionnement, liste,
           prescription, obs, labo, pays, date_init, date_final, type_prod, statut,
-          stabilite, annee, source_version, is_new_vs_previous)
+          stabilite, annee, source_version, is_new_vs_previous,
+          nom_marque_phon, dci_phon, search_tokens)
          VALUES ${placeholders}`,
         batch.flat()
       )
@@ -183,10 +203,7 @@ export async function POST(req: NextRequest) {
 
     for (let i = 0; i < retraits.length; i += 200) {
       const batch: ParsedRetrait[] = retraits.slice(i, i + 200)
-      const placeholders = batch.map((_, bi) => {
-        const base = bi * 16
-        return `($${base+1},$${base+2},$${base+3},$${base+4},$${base+5},$${base+6},$${base+7},$${base+8},$${base+9},$${base+10},$${base+11},$${base+12},$${base+13},$${base+14},$${base+15},$${base+16})`
-      }).join(',')
+      const placeholders = placeholderRows(batch.length, 19)
       const flat = batch.flatMap((r: ParsedRetrait) => [
         toSqlNull(r.n_enreg), toSqlNull(r.code), toSqlNull(r.dci), toSqlNull(r.nom_marque),
         toSqlNull(r.forme), toSqlNull(r.dosage), toSqlNull(r.conditionnement),
@@ -194,11 +211,13 @@ export async function POST(req: NextRequest) {
         toSqlNull(r.labo), toSqlNull(r.pays), toSqlNull(r.date_init),
         toSqlNull(r.type_prod), toSqlNull(r.statut),
         toSqlNull(r.date_retrait), toSqlNull(r.motif_retrait),
+        ...searchKeys(r.nom_marque, r.dci),
       ])
       await client.query(
         `INSERT INTO retraits
          (n_enreg, code, dci, nom_marque, forme, dosage, conditionnement, liste,
-          prescription, labo, pays, date_init, type_prod, statut, date_retrait, motif_retrait)
+          prescription, labo, pays, date_init, type_prod, statut, date_retrait, motif_retrait,
+          nom_marque_phon, dci_phon, search_tokens)
          VALUES ${placeholders}`,
         flat
       )
@@ -209,10 +228,7 @@ export async function POST(req: NextRequest) {
 
     for (let i = 0; i < nonRenouveles.length; i += 200) {
       const batch: ParsedNonRenouvele[] = nonRenouveles.slice(i, i + 200)
-      const placeholders = batch.map((_, bi) => {
-        const base = bi * 15
-        return `($${base+1},$${base+2},$${base+3},$${base+4},$${base+5},$${base+6},$${base+7},$${base+8},$${base+9},$${base+10},$${base+11},$${base+12},$${base+13},$${base+14},$${base+15})`
-      }).join(',')
+      const placeholders = placeholderRows(batch.length, 18)
       const flat = batch.flatMap((r: ParsedNonRenouvele) => [
         toSqlNull(r.n_enreg), toSqlNull(r.code), toSqlNull(r.dci), toSqlNull(r.nom_marque),
         toSqlNull(r.forme), toSqlNull(r.dosage), toSqlNull(r.conditionnement),
@@ -220,11 +236,13 @@ export async function POST(req: NextRequest) {
         toSqlNull(r.labo), toSqlNull(r.pays),
         toSqlNull(r.date_init), toSqlNull(r.date_final),
         toSqlNull(r.type_prod), toSqlNull(r.statut),
+        ...searchKeys(r.nom_marque, r.dci),
       ])
       await client.query(
         `INSERT INTO non_renouveles
          (n_enreg, code, dci, nom_marque, forme, dosage, conditionnement, liste,
-          prescription, labo, pays, date_init, date_final, type_prod, statut)
+          prescription, labo, pays, date_init, date_final, type_prod, statut,
+          nom_marque_phon, dci_phon, search_tokens)
          VALUES ${placeholders}`,
         flat
       )
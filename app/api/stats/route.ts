@@ -1,10 +1,22 @@
 import { NextResponse } from 'next/server'
 import { getStats } from '@/lib/queries'
+import { readSnapshot } from '@/lib/snapshots'
+import type { Stats } from '@/lib/db'
 
 export const revalidate = 3600
 
-export async function GET() {
+export async function GET(request: Request) {
   try {
+    // Snapshot de la dernière ingestion : ETag fort = sha256 du fichier
+    const snapshot = await readSnapshot<Stats>('stats')
+    if (snapshot) {
+      const headers = { 'Cache-Control': 'public, s-maxage=3600', ETag: snapshot.etag }
+      if (request.headers.get('if-none-match') === snapshot.etag) {
+        return new NextResponse(null, { status: 304, headers })
+      }
+      return NextResponse.json(snapshot.data, { headers })
+    }
+
     const stats = await getStats()
     return NextResponse.json(stats, {
       headers: { 'Cache-Control': 'public, s-maxage=3600' }
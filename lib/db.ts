@@ -176,6 +176,22 @@ export type Stats = {
   last_version: string | null
 }
 
+export type ChangeEvent = {
+  seq: string  // BIGINT → string côté pg
+  event_type: 'nouveau' | 'retrait' | 'non_renouvele' | 'modification'
+  identity_key: string
+  version_label: string | null
+  n_enreg: string | null
+  dci: string | null
+  nom_marque: string | null
+  dosage: string | null
+  labo: string | null
+  motif_retrait: string | null
+  event_date: string | null
+  payload: Record<string, unknown> | null
+  created_at: string
+}
+
 export type AtcCode = {
   code: string
   parent_code: string | null
@@ -82,7 +82,8 @@ function cleanStr(val: unknown): string | null {
 function isValidDateParts(y: number, m: number, d: number): boolean {
   if (y < 1000 || y > 9999) return false
   if (m < 1 || m > 12) return false
-  if (d < 1 || d > 31) return false
+  // 31/02 n'existe pas : Date.UTC reporterait au mois suivant
+  if (d < 1 || d > new Date(Date.UTC(y, m, 0)).getUTCDate()) return false
   return true
 }
 
@@ -0,0 +1,86 @@
+/**
+ * Clés phonétiques (français) pour la recherche tolérante aux fautes
+ * Portage de scripts/phonetic.py : les clés stockées à l'ingestion
+ * (nom_marque_phon, dci_phon, search_tokens) doivent être calculées
+ * exactement de la même façon côté requête. Toute modification des
+ * règles doit être reportée des deux côtés.
+ */
+
+// Ordre significatif : X est réécrit avant que CH/SH ne produisent des X
+const RULES: [RegExp, string][] = [
+  [/PH/g, 'F'],
+  [/TH/g, 'T'],
+  [/GH/g, 'G'],
+  [/X/g, 'KS'],
+  [/SCH/g, 'X'],
+  [/CH(?=[LR])/g, 'K'],
+  [/CH/g, 'X'],
+  [/SH/g, 'X'],
+  [/QU/g, 'K'],
+  [/Q/g, 'K'],
+  [/CK/g, 'K'],
+  [/C(?=[EIY])/g, 'S'],
+  [/C/g, 'K'],
+  [/GU(?=[EIY])/g, 'G'],
+  [/G(?=[EIY])/g, 'J'],
+  [/GN/g, 'N'],
+  [/W/g, 'V'],
+  [/Z/g, 'S'],
+  [/EAU/g, 'O'],
+  [/AU/g, 'O'],
+  [/OU/g, 'U'],
+  [/AI/g, 'E'],
+  [/EI/g, 'E'],
+  [/Y/g, 'I'],
+  [/H/g, ''],
+]
+
+// Un squelette de moins de 3 consonnes ne discrimine rien (para, pour, peros → ~PR)
+const MIN_TOKEN_KEY = 3
+
+/** Minuscules ASCII, sans accents ni ®. */
+export function fold(text: string): string {
+  return text.toLowerCase().replace(/®/g, ' ').normalize('NFKD').replace(/\p{M}/gu, '')
+}
+
+/** Squelette phonétique d'un mot (lettres a-z uniquement). */
+export function wordKey(word: string): string {
+  let s = word.toUpperCase()
+  for (const [pattern, repl] of RULES) s = s.replace(pattern, repl)
+  // E et S finaux muets
+  if (s.length > 2) s = s.replace(/[ES]$/, '')
+  if (!s) return ''
+  const code = s[0] + s.slice(1).replace(/[AEIOU]/g, '')
+  return code.replace(/(.)\1+/g, '$1')
+}
+
+/** Clé de la chaîne entière : squelettes des mots, séparés par un espace. */
+export function phoneticKey(text: string | null | undefined): string | null {
+  if (!text) return null
+  const keys = (fold(text).match(/[a-z]+/g) ?? []).map(wordKey).filter(Boolean)
+  return keys.length ? keys.join(' ') : null
+}
+
+/** Mots normalisés (≥ 2 caractères) et leurs squelettes préfixés par '~'. */
+export function textTokens(text: string | null | undefined): string[] {
+  if (!text) return []
+  const tokens = new Set<string>()
+  for (const word of fold(text).match(/[a-z0-9]+/g) ?? []) {
+    if (word.length < 2) continue
+    tokens.add(word)
+    if (/^[a-z]+$/.test(word) && word.length >= 3) {
+      const key = wordKey(word)
+      if (key.length >= MIN_TOKEN_KEY) tokens.add(`~${key}`)
+    }
+  }
+  return Array.from(tokens).sort()
+}
+
+/** [nom_marque_phon, dci_phon, search_tokens] d'une ligne (search_keys côté Python). */
+export function searchKeys(
+  nomMarque: string | null | undefined,
+  dci: string | null | undefined
+): [string | null, string | null, string[]] {
+  const tokens = Array.from(new Set([...textTokens(nomMarque), ...textTokens(dci)])).sort()
+  return [phoneticKey(nomMarque), phoneticKey(dci), tokens]
+}
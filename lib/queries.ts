@@ -4,7 +4,9 @@
  */
 
 import { query, queryOne } from './db'
-import type { Enregistrement, Retrait, NonRenouvele, SearchResult, Stats, MedicamentDetail, AtcCode } from './db'
+import type { Enregistrement, Retrait, NonRenouvele, SearchResult, Stats, MedicamentDetail, AtcCode, ChangeEvent } from './db'
+import { readSnapshot, readSnapshotList } from './snapshots'
+import { textTokens } from './phonetic'
 
 const schemaFeatureCache = new Map<string, boolean>()
 
@@ -45,8 +47,30 @@ async function hasColumn(tableName: string, columnName: string): Promise<boolean
   return exists
 }
 
+async function hasFunction(functionName: string): Promise<boolean> {
+  const cacheKey = `function.${functionName}`
+  if (schemaFeatureCache.has(cacheKey)) return schemaFeatureCache.get(cacheKey) ?? false
+
+  const row = await queryOne<{ exists: boolean }>(`
+    SELECT EXISTS (
+      SELECT 1
+      FROM information_schema.routines
+      WHERE routine_schema = 'public'
+        AND routine_name = $1
+    ) AS "exists"
+  `, [functionName])
+
+  const exists = row?.exists ?? false
+  schemaFeatureCache.set(cacheKey, exists)
+  return exists
+}
+
 // ─── STATS ────────────────────────────────────────────────────
 export async function getStats(): Promise<Stats> {
+  // 0. Snapshot statique de la dernière ingestion (si activé)
+  const snapshot = await readSnapshot<Stats>('stats')
+  if (snapshot && snapshot.data.total_enregistrements > 0) return snapshot.data
+
   // 1. Essayer la vue v_stats en premier (chemin rapide)
   let row: Stats | null = null
   try {
@@ -136,7 +160,27 @@ export async function searchMedicaments(
   const laboPattern = `%${labo}%`
   const substancePattern = `%${substance}%`
 
-  const advancedClause = buildAdvancedSearchClause(advanced, 8)
+  // Squelettes phonétiques de la requête (sql/07_phonetic_search.sql) : rattrape
+  // les noms saisis "à l'oreille" (OGMENTIN → AUGMENTIN) par lookup GIN
+  const hasSearchTokens = await hasColumn('enregistrements', 'search_tokens')
+  const phoneticTokens = trimmedQuery ? textTokens(trimmedQuery).filter((token) => token.startsWith('~')) : []
+  const phoneticClause = hasSearchTokens ? `OR search_tokens && $8::TEXT[]` : ''
+  const phoneticParams = hasSearchTokens ? [phoneticTokens] : []
+  // Les correspondances exactes (sous-chaîne) passent avant celles trouvées
+  // uniquement par le squelette phonétique, qui ne doivent pas les évincer du LIMIT
+  const matchRank = (haystack: string) => hasSearchTokens
+    ? `, CASE WHEN $1 = '' OR ${haystack} ILIKE $2 THEN 0 ELSE 1 END AS match_rank`
+    : ''
+  // search_haystack() a le même résultat que CONCAT_WS mais est couvert par un
+  // index trigramme (sql/07_phonetic_search.sql) : l'expression doit rester identique.
+  // Sous trois caractères il n'y a aucun trigramme, le Seq Scan reste plus rapide avec CONCAT_WS.
+  const useHaystackIndex = trimmedQuery.length >= 3 && await hasFunction('search_haystack')
+  const haystack = useHaystackIndex ? 'search_haystack(' : "CONCAT_WS(' ', "
+  const enregHaystack = `${haystack}n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, annee::TEXT)`
+  const retraitHaystack = `${haystack}n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, motif_retrait)`
+  const nonRenouvHaystack = `CONCAT_WS(' ', n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, date_final::TEXT)`
+
+  const advancedClause = buildAdvancedSearchClause(advanced, 8 + phoneticParams.length)
 
   const results = await query<SearchResult>(`
     SELECT * FROM (
@@ -147,10 +191,12 @@ export async function searchMedicaments(
         NULL::DATE AS date_retrait,
         NULL::TEXT AS motif_retrait,
         date_final
+        ${matchRank(enregHaystack)}
       FROM enregistrements
       WHERE (
         $1 = ''
-        OR CONCAT_WS(' ', n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, annee::TEXT) ILIKE $2
+        OR ${enregHaystack} ILIKE $2
+        ${phoneticClause}
       )
       AND ($3 = '' OR labo ILIKE $4)
       AND ($5 = '' OR dci ILIKE $6)
@@ -163,10 +209,12 @@ export async function searchMedicaments(
         type_prod, statut, NULL::SMALLINT AS annee,
         date_retrait, motif_retrait,
         NULL::DATE AS date_final
+        ${matchRank(retraitHaystack)}
       FROM retraits
       WHERE (
         $1 = ''
-        OR CONCAT_WS(' ', n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, motif_retrait) ILIKE $2
+        OR ${retraitHaystack} ILIKE $2
+        ${phoneticClause}
       )
       AND ($3 = '' OR labo ILIKE $4)
       AND ($5 = '' OR dci ILIKE $6)
@@ -180,10 +228,12 @@ export async function searchMedicaments(
         NULL::DATE AS date_retrait,
         NULL::TEXT AS motif_retrait,
         date_final
+        ${matchRank(nonRenouvHaystack)}
       FROM non_renouveles
       WHERE (
         $1 = ''
-        OR CONCAT_WS(' ', n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, date_final::TEXT) ILIKE $2
+        OR ${nonRenouvHaystack} ILIKE $2
+        ${phoneticClause}
       )
       AND ($3 = '' OR labo ILIKE $4)
       AND ($5 = '' OR dci ILIKE $6)
@@ -191,10 +241,14 @@ export async function searchMedicaments(
     ${scopeFilter ? `${scopeFilter} ${advancedClause.sql ? 'AND' : ''}` : `${advancedClause.sql ? 'WHERE' : ''}`}
     ${advancedClause.sql}
     ORDER BY
+      ${hasSearchTokens ? 'match_rank,' : ''}
       CASE source WHEN 'enregistrement' THEN 1 WHEN 'retrait' THEN 2 ELSE 3 END,
       nom_marque
     LIMIT $7
-  `, [trimmedQuery, searchPattern, labo, laboPattern, substance, substancePattern, limit, ...advancedClause.params])
+  `, [
+    trimmedQuery, searchPattern, labo, laboPattern, substance, substancePattern, limit,
+    ...phoneticParams, ...advancedClause.params,
+  ])
 
   return results
 }
@@ -284,6 +338,9 @@ function buildAdvancedSearchClause(conditions: AdvancedSearchCondition[], startI
 
 
 export async function getLatestNouveautes(limit = 20): Promise<Enregistrement[]> {
+  const snapshot = await readSnapshotList<Enregistrement>('nouveautes', limit)
+  if (snapshot) return snapshot
+
   const hasIsNewFlag = await hasColumn('enregistrements', 'is_new_vs_previous')
   const hasSourceVersion = await hasColumn('enregistrements', 'source_version')
 
@@ -345,6 +402,9 @@ export async function getAllEnregistrements(annee: number, limit = 50): Promise<
 }
 
 export async function getAvailableAnnees(limit = 6): Promise<number[]> {
+  const snapshot = await readSnapshot<number[]>('annees')
+  if (snapshot) return snapshot.data.slice(0, limit)
+
   const years = await query<{ annee: number | null }>(`
     SELECT DISTINCT annee
     FROM enregistrements
@@ -412,6 +472,9 @@ export async function getGeneriques() {
 
 // ─── RETRAITS ─────────────────────────────────────────────────
 export async function getRetraits(limit = 100): Promise<Retrait[]> {
+  const snapshot = await readSnapshotList<Retrait>('retraits', limit)
+  if (snapshot) return snapshot
+
   return query<Retrait>(`
     SELECT * FROM retraits
     ORDER BY date_retrait DESC NULLS LAST, id DESC
@@ -420,6 +483,10 @@ export async function getRetraits(limit = 100): Promise<Retrait[]> {
 }
 
 export async function getLastRetraits(limit = 3): Promise<Retrait[]> {
+  // Même ordre que getRetraits() : les lignes datées viennent en premier
+  const snapshot = await readSnapshotList<Retrait>('retraits', limit, (r) => r.date_retrait !== null)
+  if (snapshot) return snapshot
+
   return query<Retrait>(`
     SELECT * FROM retraits
     WHERE date_retrait IS NOT NULL
@@ -429,6 +496,9 @@ export async function getLastRetraits(limit = 3): Promise<Retrait[]> {
 }
 
 export async function getMotifStats() {
+  const snapshot = await readSnapshot<{ motif: string; n: string }[]>('motifs')
+  if (snapshot) return snapshot.data
+
   return query<{ motif: string; n: string }>(`
     SELECT
       COALESCE(motif_retrait, 'Non précisé') AS motif,
@@ -449,6 +519,46 @@ export async function getNonRenouveles(limit = 50): Promise<NonRenouvele[]> {
   `, [limit])
 }
 
+// ─── FLUX DE CHANGEMENTS ──────────────────────────────────────
+/**
+ * Évènements publiés par l'ingestion après le curseur `afterSeq`
+ * (table nomenclature_changes, voir sql/05_change_events.sql).
+ * Retourne un tableau vide si le flux n'existe pas encore.
+ */
+export async function getChangesSince(
+  afterSeq: number | string = 0,
+  types: ChangeEvent['event_type'][] = [],
+  limit = 200
+): Promise<ChangeEvent[]> {
+  if (!await hasTable('nomenclature_changes')) return []
+  return query<ChangeEvent>(`
+    SELECT * FROM nomenclature_changes
+    WHERE seq > $1
+      AND (cardinality($2::TEXT[]) = 0 OR event_type = ANY($2::TEXT[]))
+    ORDER BY seq
+    LIMIT $3
+  `, [afterSeq, types, limit])
+}
+
+export async function getChangeCursor(consumer: string): Promise<string> {
+  if (!await hasTable('change_feed_cursors')) return '0'
+  const row = await queryOne<{ last_seq: string }>(`
+    SELECT last_seq FROM change_feed_cursors WHERE consumer = $1
+  `, [consumer])
+  return row?.last_seq ?? '0'
+}
+
+export async function setChangeCursor(consumer: string, lastSeq: number | string) {
+  return queryOne(`
+    INSERT INTO change_feed_cursors (consumer, last_seq, updated_at)
+    VALUES ($1, $2, NOW())
+    ON CONFLICT (consumer) DO UPDATE SET
+      last_seq = GREATEST(change_feed_cursors.last_seq, EXCLUDED.last_seq),
+      updated_at = NOW()
+    RETURNING last_seq
+  `, [consumer, lastSeq])
+}
+
 // ─── NEWSLETTER ───────────────────────────────────────────────
 export async function addSubscriber(email: string, nom: string | null, confirmToken: string, unsubToken: string) {
   return queryOne(`
@@ -0,0 +1,85 @@
+/**
+ * Snapshots JSON statiques produits à l'ingestion (scripts/export_snapshots.py)
+ * Lus depuis public/snapshots/ avant de solliciter PostgreSQL.
+ *
+ * Désactivé par défaut : une ingestion via /admin ne régénère pas les
+ * snapshots. Activer avec USE_STATIC_SNAPSHOTS=true quand les ingestions
+ * passent par le script Python et que public/snapshots est déployé.
+ */
+
+import { readFile, stat } from 'fs/promises'
+import path from 'path'
+
+const SNAPSHOT_DIR = path.join(process.cwd(), 'public', 'snapshots')
+const MANIFEST_PATH = path.join(SNAPSHOT_DIR, 'manifest.json')
+
+export type SnapshotManifest = {
+  version_label: string | null
+  generated_at: string
+  base: string
+  page_size: number
+  files: Record<string, { path: string; sha256: string; bytes: number }>
+}
+
+export type SnapshotPage<T> = {
+  page: number
+  pages: number
+  page_size: number
+  total: number
+  truncated: boolean
+  items: T[]
+}
+
+let manifestCache: { mtimeMs: number; manifest: SnapshotManifest } | null = null
+const fileCache = new Map<string, unknown>()
+
+export function snapshotsEnabled(): boolean {
+  return process.env.USE_STATIC_SNAPSHOTS === 'true'
+}
+
+export async function getSnapshotManifest(): Promise<SnapshotManifest | null> {
+  if (!snapshotsEnabled()) return null
+  try {
+    // Relu seulement si le fichier a changé (nouvelle ingestion)
+    const { mtimeMs } = await stat(MANIFEST_PATH)
+    if (manifestCache?.mtimeMs === mtimeMs) return manifestCache.manifest
+    const manifest = JSON.parse(await readFile(MANIFEST_PATH, 'utf-8')) as SnapshotManifest
+    manifestCache = { mtimeMs, manifest }
+    return manifest
+  } catch {
+    return null
+  }
+}
+
+/** Contenu + ETag fort (sha256 du fichier lui-même, lu dans son entrée du manifest) ; null si absent → requête DB. */
+export async function readSnapshot<T>(name: string): Promise<{ data: T; etag: string } | null> {
+  const manifest = await getSnapshotManifest()
+  const entry = manifest?.files[name]
+  if (!entry) return null
+
+  // Les fichiers versionnés sont immuables : le cache par chemin suffit
+  if (!fileCache.has(entry.path)) {
+    try {
+      fileCache.set(entry.path, JSON.parse(await readFile(path.join(SNAPSHOT_DIR, entry.path), 'utf-8')))
+    } catch {
+      return null
+    }
+  }
+  return { data: fileCache.get(entry.path) as T, etag: `"${entry.sha256}"` }
+}
+
+/** Premières lignes d'une liste paginée ; null si le snapshot ne couvre pas `limit`. */
+export async function readSnapshotList<T>(
+  name: string,
+  limit: number,
+  filter: (item: T) => boolean = () => true,
+): Promise<T[] | null> {
+  const items: T[] = []
+  for (let page = 1; ; page++) {
+    const snap = await readSnapshot<SnapshotPage<T>>(`${name}-${page}`)
+    if (!snap) return null
+    items.push(...snap.data.items.filter(filter))
+    if (items.length >= limit) return items.slice(0, limit)
+    if (page >= snap.data.pages) return snap.data.truncated ? null : items
+  }
+}
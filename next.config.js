@@ -3,6 +3,19 @@ const nextConfig = {
   images: {
     domains: ['pharmaveille-dz.com'],
   },
+  async headers() {
+    return [
+      {
+        // Snapshots versionnés (scripts/export_snapshots.py) : contenu immuable
+        source: '/snapshots/:version/:file',
+        headers: [{ key: 'Cache-Control', value: 'public, max-age=31536000, immutable' }],
+      },
+      {
+        source: '/snapshots/manifest.json',
+        headers: [{ key: 'Cache-Control', value: 'public, max-age=60, s-maxage=300, stale-while-revalidate=600' }],
+      },
+    ]
+  },
   experimental: {
     serverActions: {
       // Augmenter la limite pour l'upload des fichiers Excel MIPH (peuvent dépasser 4 Mo)
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+Banc de latence de la recherche + contrôle des plans EXPLAIN.
+
+Rejoue un corpus de requêtes (marques, DCI, fautes de frappe, préfixes d'un et
+deux caractères, pour chaque scope) contre :
+  - la fonction SQL search_medicaments(query, scope, lim[, query_phon, query_tokens]) ;
+  - le SQL de searchMedicaments() / buildAdvancedSearchClause() (lib/queries.ts).
+
+Pour chaque forme de requête : p50/p95/p99, lignes retournées et plan
+EXPLAIN (ANALYZE, BUFFERS). Code de sortie 1 si un plan retombe sur un
+Seq Scan d'une table volumineuse, si search_medicaments n'est plus inlinée
+(Function Scan opaque), si une forme dépasse le plafond p95 (--max-p95-ms)
+ou si la latence régresse par rapport à la référence enregistrée.
+
+Usage:
+  # Base locale jetable, alimentée par une nomenclature synthétique
+  DATABASE_URL=postgresql://localhost/pharmaveille_bench \\
+    python scripts/bench_search.py --seed-synthetic 6000 --save-baseline data/bench_baseline.json
+
+  # Après une modification de schéma / d'index
+  DATABASE_URL=... python scripts/bench_search.py --baseline data/bench_baseline.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+from ingest_to_supabase import ingest, infer_version_from_filename, log
+from phonetic import phonetic_key, text_tokens
+from synthetic_nomenclature import build_workbook
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+WATCHED_TABLES = ("enregistrements", "retraits", "non_renouveles")
+SCOPES = ("all", "enregistrement", "retrait", "non_renouvele")
+# Plafond p95 appliqué même sans référence : ~35 ms au pire sur 6000 enregistrements
+DEFAULT_MAX_P95_MS = 100.0
+LOCAL_HOSTS = {None, "", "localhost", "127.0.0.1", "::1"}
+
+# ─── SQL rejoué ──────────────────────────────────────────────
+# Copie de searchMedicaments() (lib/queries.ts) avec des paramètres nommés.
+# À garder synchronisé si la requête TypeScript évolue.
+SEARCH_MEDICAMENTS_TS_SQL = """
+    SELECT * FROM (
+      SELECT
+        'enregistrement' AS source,
+        id, n_enreg, dci, nom_marque, forme, dosage, labo, pays,
+        type_prod, statut, annee,
+        NULL::DATE AS date_retrait,
+        NULL::TEXT AS motif_retrait,
+        date_final
+        {enreg_rank}
+      FROM enregistrements
+      WHERE (
+        %(q)s = ''
+        OR {enreg_haystack} ILIKE %(q_pattern)s
+        {phonetic}
+      )
+      AND (%(labo)s = '' OR labo ILIKE %(labo_pattern)s)
+      AND (%(substance)s = '' OR dci ILIKE %(substance_pattern)s)
+
+      UNION ALL
+
+      SELECT
+        'retrait' AS source,
+        id, n_enreg, dci, nom_marque, forme, dosage, labo, pays,
+        type_prod, statut, NULL::SMALLINT AS annee,
+        date_retrait, motif_retrait,
+        NULL::DATE AS date_final
+        {retrait_rank}
+      FROM retraits
+      WHERE (
+        %(q)s = ''
+        OR {retrait_haystack} ILIKE %(q_pattern)s
+        {phonetic}
+      )
+      AND (%(labo)s = '' OR labo ILIKE %(labo_pattern)s)
+      AND (%(substance)s = '' OR dci ILIKE %(substance_pattern)s)
+
+      UNION ALL
+
+      SELECT
+        'non_renouvele' AS source,
+        id, n_enreg, dci, nom_marque, forme, dosage, labo, pays,
+        type_prod, statut, NULL::SMALLINT AS annee,
+        NULL::DATE AS date_retrait,
+        NULL::TEXT AS motif_retrait,
+        date_final
+        {non_renouv_rank}
+      FROM non_renouveles
+      WHERE (
+        %(q)s = ''
+        OR {non_renouv_haystack} ILIKE %(q_pattern)s
+        {phonetic}
+      )
+      AND (%(labo)s = '' OR labo ILIKE %(labo_pattern)s)
+      AND (%(substance)s = '' OR dci ILIKE %(substance_pattern)s)
+    ) AS combined
+    {where}
+    ORDER BY
+      {order_rank}
+      CASE source WHEN 'enregistrement' THEN 1 WHEN 'retrait' THEN 2 ELSE 3 END,
+      nom_marque
+    LIMIT %(limit)s
+"""
+
+# {concat} : search_haystack( si la fonction indexée existe, CONCAT_WS(' ', sinon
+ENREG_HAYSTACK = "{concat}n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, annee::TEXT)"
+RETRAIT_HAYSTACK = "{concat}n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, motif_retrait)"
+NON_RENOUV_HAYSTACK = "CONCAT_WS(' ', n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, date_final::TEXT)"
+
+SCOPE_CONDITIONS = {
+    "enregistrement": "source = 'enregistrement'",
+    "retrait": "source = 'retrait'",
+    "non_renouvele": "source = 'non_renouvele'",
+    "all": "",
+}
+
+ADVANCED_STRING_FIELDS = {
+    "n_enreg": "combined.n_enreg",
+    "dci": "combined.dci",
+    "nom_marque": "combined.nom_marque",
+    "forme": "combined.forme",
+    "dosage": "combined.dosage",
+    "labo": "combined.labo",
+    "pays": "combined.pays",
+    "type_prod": "combined.type_prod",
+    "statut": "combined.statut",
+}
+ADVANCED_NUMBER_FIELDS = {
+    "annee": "combined.annee::numeric",
+}
+NUMERIC_OPERATORS = {"equals": "=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def build_advanced_clause(conditions):
+    """Équivalent Python de buildAdvancedSearchClause() (champs texte + annee)."""
+    parts, params = [], {}
+    for i, cond in enumerate(conditions):
+        value = (cond.get("value") or "").strip()
+        if not value:
+            continue
+        prefix = f" {'OR' if cond.get('bool') == 'OR' else 'AND'} " if parts else ""
+        name = f"adv{i}"
+        if cond["field"] in ADVANCED_STRING_FIELDS:
+            field = ADVANCED_STRING_FIELDS[cond["field"]]
+            if cond["operator"] == "equals":
+                params[name] = value
+            elif cond["operator"] == "starts_with":
+                params[name] = f"{value}%"
+            else:
+                params[name] = f"%{value}%"
+            parts.append(f"{prefix}COALESCE({field}, '') ILIKE %({name})s")
+        elif cond["field"] in ADVANCED_NUMBER_FIELDS and cond["operator"] in NUMERIC_OPERATORS:
+            params[name] = float(value.replace(",", "."))
+            parts.append(f"{prefix}{ADVANCED_NUMBER_FIELDS[cond['field']]} {NUMERIC_OPERATORS[cond['operator']]} %({name})s")
+    if not parts:
+        return "", {}
+    return f"({''.join(parts)})", params
+
+
+def phonetic_tokens(q):
+    return [t for t in text_tokens(q) if t.startswith("~")] if q else []
+
+
+def match_rank(haystack, search_keys):
+    """Colonne match_rank de searchMedicaments() : sous-chaîne exacte avant phonétique."""
+    if not search_keys:
+        return ""
+    return f", CASE WHEN %(q)s = '' OR {haystack} ILIKE %(q_pattern)s THEN 0 ELSE 1 END AS match_rank"
+
+
+def search_medicaments_ts(
+    q, scope="all", limit=40, labo="", substance="", advanced=None, search_keys=False, indexed_haystack=False,
+):
+    """Construit (sql, params) comme searchMedicaments() côté Next.js."""
+    advanced_sql, advanced_params = build_advanced_clause(advanced or [])
+    conditions = [c for c in (SCOPE_CONDITIONS.get(scope, ""), advanced_sql) if c]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Clause ajoutée par searchMedicaments() quand search_tokens existe
+    phonetic = "OR search_tokens && %(q_tokens)s::TEXT[]" if search_keys else ""
+    params = {
+        "q": q, "q_pattern": f"%{q}%",
+        "labo": labo, "labo_pattern": f"%{labo}%",
+        "substance": substance, "substance_pattern": f"%{substance}%",
+        "limit": limit,
+        "q_tokens": phonetic_tokens(q),
+        **advanced_params,
+    }
+    # Même règle que searchMedicaments() : aucun trigramme sous trois caractères
+    concat = "search_haystack(" if indexed_haystack and len(q) >= 3 else "CONCAT_WS(' ', "
+    enreg_haystack = ENREG_HAYSTACK.format(concat=concat)
+    retrait_haystack = RETRAIT_HAYSTACK.format(concat=concat)
+    sql = SEARCH_MEDICAMENTS_TS_SQL.format(
+        where=where, phonetic=phonetic,
+        enreg_haystack=enreg_haystack,
+        retrait_haystack=retrait_haystack,
+        non_renouv_haystack=NON_RENOUV_HAYSTACK,
+        enreg_rank=match_rank(enreg_haystack, search_keys),
+        retrait_rank=match_rank(retrait_haystack, search_keys),
+        non_renouv_rank=match_rank(NON_RENOUV_HAYSTACK, search_keys),
+        order_rank="match_rank," if search_keys else "",
+    )
+    return sql, params
+
+
+def search_medicaments_fn(q, scope="all", limit=30, search_keys=False):
+    params = {"q": q, "scope": scope, "limit": limit}
+    if not search_keys:
+        return "SELECT * FROM search_medicaments(%(q)s, %(scope)s, %(limit)s)", params
+    params.update(q_phon=phonetic_key(q), q_tokens=phonetic_tokens(q))
+    return (
+        "SELECT * FROM search_medicaments(%(q)s, %(scope)s, %(limit)s, %(q_phon)s, %(q_tokens)s::TEXT[])",
+        params,
+    )
+
+
+def has_search_keys(cur):
+    """Colonnes de sql/07_phonetic_search.sql présentes ?"""
+    cur.execute("""
+        SELECT EXISTS (
+          SELECT 1 FROM information_schema.columns
+          WHERE table_schema = current_schema() AND table_name = 'enregistrements' AND column_name = 'search_tokens'
+        )
+    """)
+    return cur.fetchone()[0]
+
+
+def has_search_haystack(cur):
+    """Fonction search_haystack() (texte indexé de searchMedicaments) présente ?"""
+    cur.execute("""
+        SELECT EXISTS (
+          SELECT 1 FROM information_schema.routines
+          WHERE routine_schema = current_schema() AND routine_name = 'search_haystack'
+        )
+    """)
+    return cur.fetchone()[0]
+
+
+# ─── Corpus ──────────────────────────────────────────────────
+
+def typo(word: str, rng: random.Random):
+    """Introduit une faute de frappe simple (suppression, inversion ou substitution)."""
+    if len(word) < 4:
+        return word
+    i = rng.randint(1, len(word) - 2)
+    kind = rng.choice(("drop", "swap", "sub"))
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice("AEIOUKSZ") + word[i + 1:]
+
+
+def build_corpus(cur, per_kind: int, seed: int):
+    """
+    Échantillonne des requêtes réalistes depuis la base alimentée.
+    Retourne une liste de (kind, query).
+    """
+    rng = random.Random(seed)
+    cur.execute("SELECT DISTINCT split_part(nom_marque, ' ', 1) FROM enregistrements WHERE nom_marque IS NOT NULL")
+    brands = sorted(r[0].strip("®").strip() for r in cur.fetchall() if r[0] and len(r[0].strip("®")) >= 3)
+    cur.execute("SELECT DISTINCT dci FROM enregistrements WHERE dci IS NOT NULL")
+    dcis = sorted(r[0] for r in cur.fetchall())
+    if not brands or not dcis:
+        raise SystemExit("Base vide : alimente-la avec --seed-synthetic ou --seed-xlsx")
+
+    corpus = []
+    for _ in range(per_kind):
+        brand = rng.choice(brands)
+        dci = rng.choice(dcis)
+        corpus.append(("marque", brand))
+        corpus.append(("dci", dci.split(" ")[0]))
+        corpus.append(("faute", typo(brand, rng)))
+        corpus.append(("prefixe1", brand[:1]))
+        corpus.append(("prefixe2", brand[:2]))
+    return corpus
+
+
+def query_shapes(corpus, limit: int, search_keys=False, indexed_haystack=False):
+    """
+    Décline le corpus en formes de requête.
+    Chaque forme : (nom, tables_indexées, [(sql, params), ...]) ; un Seq Scan
+    sur l'une des tables_indexées est une régression de plan.
+    """
+    by_kind = {}
+    for kind, q in corpus:
+        by_kind.setdefault(kind, []).append(q)
+
+    # Le texte de searchMedicaments() n'est indexé que sur enregistrements et
+    # retraits (search_haystack, sql/07_phonetic_search.sql)
+    haystack_tables = ("enregistrements", "retraits") if search_keys and indexed_haystack else ()
+
+    shapes = []
+    for kind, queries in by_kind.items():
+        # Préfixes d'un ou deux caractères : ILIKE '%ab%' ne produit aucun
+        # trigramme, l'index ne serait parcouru qu'en entier (Seq Scan attendu).
+        prefix = kind in ("prefixe1", "prefixe2")
+        for scope in SCOPES:
+            shapes.append((
+                f"search_medicaments/{kind}/{scope}",
+                () if prefix else WATCHED_TABLES,
+                [search_medicaments_fn(q, scope, limit, search_keys) for q in queries],
+            ))
+            shapes.append((
+                f"searchMedicaments/{kind}/{scope}",
+                () if prefix else haystack_tables,
+                [search_medicaments_ts(q, scope, limit, search_keys=search_keys, indexed_haystack=indexed_haystack)
+                 for q in queries],
+            ))
+
+    # Filtres avancés seuls (q vide) : aucun index sur les champs combinés
+    shapes.append((
+        "searchMedicaments/avance/all",
+        (),
+        [search_medicaments_ts("", "all", limit, advanced=[
+            {"field": "dci", "operator": "starts_with", "value": q[:4]},
+            {"field": "annee", "operator": "gte", "value": "2020", "bool": "AND"},
+        ], search_keys=search_keys, indexed_haystack=indexed_haystack) for q in by_kind.get("dci", [])],
+    ))
+    return shapes
+
+
+# ─── Mesures ─────────────────────────────────────────────────
+
+def percentile(values, pct: float):
+    """Percentile par rang le plus proche (valeurs en ms)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def seq_scans(plan: dict):
+    """Tables surveillées parcourues séquentiellement dans un plan JSON."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in WATCHED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def function_scans(plan: dict):
+    """
+    Fonctions SQL restées opaques dans un plan JSON : un Function Scan ne montre
+    pas les tables parcourues (fonction non inlinée, clause SET par exemple).
+    """
+    found = []
+    if plan.get("Node Type") == "Function Scan":
+        found.append(plan.get("Function Name", "?"))
+    for child in plan.get("Plans", []):
+        found.extend(function_scans(child))
+    return found
+
+
+def run_shape(cur, queries, repeat: int):
+    timings, rows = [], []
+    for _ in range(repeat):
+        for sql, params in queries:
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            result = cur.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+            rows.append(len(result))
+    return timings, rows
+
+
+def explain(cur, sql, params):
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+    return cur.fetchone()[0][0]
+
+
+def table_sizes(cur):
+    cur.execute(
+        "SELECT relname, reltuples::BIGINT FROM pg_class WHERE relname = ANY(%s) AND relkind = 'r'",
+        (list(WATCHED_TABLES),),
+    )
+    return dict(cur.fetchall())
+
+
+def benchmark(conn, corpus, args):
+    cur = conn.cursor()
+    sizes = table_sizes(cur)
+    report = {"tables": sizes, "shapes": {}}
+
+    shapes = query_shapes(corpus, args.limit, has_search_keys(cur), has_search_haystack(cur))
+    for name, indexed_tables, queries in shapes:
+        if not queries:
+            continue
+        if args.warmup:
+            run_shape(cur, queries, args.warmup)
+        timings, rows = run_shape(cur, queries, args.repeat)
+        plan = explain(cur, *queries[0])
+        scanned = sorted({t for t in seq_scans(plan["Plan"]) if sizes.get(t, 0) >= args.seqscan_min_rows})
+        report["shapes"][name] = {
+            "expect_index": list(indexed_tables),
+            "samples": len(timings),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "rows_avg": round(sum(rows) / len(rows), 1),
+            "rows_max": max(rows),
+            "seq_scans": scanned,
+            "function_scans": function_scans(plan["Plan"]),
+            "shared_hit": plan["Plan"].get("Shared Hit Blocks", 0),
+            "shared_read": plan["Plan"].get("Shared Read Blocks", 0),
+        }
+        if args.plans_dir:
+            args.plans_dir.mkdir(parents=True, exist_ok=True)
+            (args.plans_dir / f"{name.replace('/', '__')}.json").write_text(json.dumps(plan, indent=2))
+
+    conn.rollback()
+    cur.close()
+    return report
+
+
+def check(report, baseline, args):
+    """Retourne la liste des échecs (régressions de plan ou de latence)."""
+    failures = []
+    base_shapes = (baseline or {}).get("shapes", {})
+    for name, shape in report["shapes"].items():
+        base = base_shapes.get(name)
+        if shape["expect_index"] and shape["function_scans"]:
+            # Plan opaque : l'absence de Seq Scan n'y prouve rien
+            failures.append(f"{name}: plan non inspectable (Function Scan {', '.join(shape['function_scans'])})")
+        # Un Seq Scan déjà présent dans la référence est un état connu et accepté.
+        known = set(base["seq_scans"]) if base else set()
+        new = [t for t in shape["seq_scans"] if t in shape["expect_index"] and t not in known]
+        if new:
+            failures.append(f"{name}: Seq Scan sur {', '.join(new)}")
+        if args.max_p95_ms and shape["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{name}: p95 {shape['p95_ms']} ms > {args.max_p95_ms} ms")
+        if base:
+            limit = base["p95_ms"] * (1 + args.max_regression)
+            if shape["p95_ms"] > limit and shape["p95_ms"] - base["p95_ms"] > args.min_delta_ms:
+                failures.append(f"{name}: p95 {base['p95_ms']} → {shape['p95_ms']} ms (+{args.max_regression:.0%} max)")
+    return failures
+
+
+def print_report(report):
+    width = max(len(n) for n in report["shapes"]) if report["shapes"] else 20
+    print(f"\n{'forme'.ljust(width)}  {'p50':>8}  {'p95':>8}  {'p99':>8}  {'lignes':>7}  seq scan")
+    for name, s in sorted(report["shapes"].items()):
+        print(
+            f"{name.ljust(width)}  {s['p50_ms']:>8.2f}  {s['p95_ms']:>8.2f}  {s['p99_ms']:>8.2f}  "
+            f"{s['rows_avg']:>7.1f}  {', '.join(s['seq_scans']) or '-'}"
+        )
+    print()
+
+
+# ─── Alimentation de la base ─────────────────────────────────
+
+def ensure_local(database_url: str, allow_remote: bool):
+    host = parse_dsn(database_url).get("host")
+    if host not in LOCAL_HOSTS and not allow_remote:
+        log(f"Hôte {host} non local : l'alimentation vide les tables. Passe --allow-remote pour forcer.", "ERROR")
+        sys.exit(1)
+
+
+def seed(conn, args):
+    ensure_local(DATABASE_URL, args.allow_remote)
+    if args.seed_xlsx:
+        label = infer_version_from_filename(args.seed_xlsx)
+        log(f"Alimentation depuis {args.seed_xlsx} ({label})")
+        ingest(conn, args.seed_xlsx, None, label, None)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_workbook(Path(tmp) / "synthetic_decembre_2025.xlsx", rows=args.seed_synthetic, seed=args.corpus_seed)
+        log(f"Alimentation synthétique : {args.seed_synthetic} enregistrements")
+        ingest(conn, path, None, "Décembre 2025", None)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Banc de latence de la recherche + contrôle des plans")
+    seeding = parser.add_mutually_exclusive_group()
+    seeding.add_argument("--seed-synthetic", type=int, default=None, metavar="N", help="Alimenter avec N enregistrements synthétiques")
+    seeding.add_argument("--seed-xlsx", type=Path, default=None, help="Alimenter avec une vraie nomenclature (.xlsx)")
+    parser.add_argument("--allow-remote", action="store_true", help="Autoriser l'alimentation d'une base non locale")
+    parser.add_argument("--per-kind", type=int, default=20, help="Requêtes échantillonnées par type (marque, dci, faute…)")
+    parser.add_argument("--corpus-seed", type=int, default=42, help="Graine du corpus (reproductible)")
+    parser.add_argument("--limit", type=int, default=30, help="LIMIT des requêtes rejouées")
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions mesurées du corpus")
+    parser.add_argument("--warmup", type=int, default=1, help="Passes de chauffe non mesurées")
+    parser.add_argument("--seqscan-min-rows", type=int, default=1000, help="Ignorer les Seq Scan sur les tables plus petites")
+    parser.add_argument("--baseline", type=Path, default=None, help="Référence JSON à comparer")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="Enregistrer ce passage comme référence")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Régression p95 tolérée (0.25 = +25 %%)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Écart p95 minimal (ms) pour compter une régression")
+    parser.add_argument(
+        "--max-p95-ms", type=float, default=DEFAULT_MAX_P95_MS,
+        help=f"Plafond absolu de p95 (ms) par forme, même sans référence (défaut {DEFAULT_MAX_P95_MS:g}, 0 = désactivé)",
+    )
+    parser.add_argument("--plans-dir", type=Path, default=None, help="Dossier où écrire les plans EXPLAIN JSON")
+    parser.add_argument("--json", type=Path, default=None, help="Écrire le rapport complet en JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    if not DATABASE_URL:
+        log("DATABASE_URL manquante", "ERROR")
+        sys.exit(1)
+
+    args = parse_args()
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.seed_synthetic or args.seed_xlsx:
+            seed(conn, args)
+
+        cur = conn.cursor()
+        corpus = build_corpus(cur, args.per_kind, args.corpus_seed)
+        cur.close()
+        log(f"Corpus : {len(corpus)} requêtes × {len(SCOPES)} scopes")
+
+        report = benchmark(conn, corpus, args)
+    finally:
+        conn.close()
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        log(f"Référence enregistrée : {args.save_baseline}", "OK")
+        sys.exit(0)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    failures = check(report, baseline, args)
+    for failure in failures:
+        log(failure, "ERROR")
+    if failures:
+        sys.exit(1)
+    log("Aucune régression détectée", "OK")
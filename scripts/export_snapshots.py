@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Export des lectures "chaudes" en fichiers JSON statiques.
+
+Accueil, /veille, /alertes et /api/stats relancent à chaque requête les mêmes
+requêtes (getStats, getLatestNouveautes, getLastRetraits, getMotifStats,
+getAvailableAnnees), dont le résultat ne change qu'à l'ingestion. Ce script
+les précalcule dans public/snapshots/ :
+
+  public/snapshots/<version>-<hash>/stats.json
+                                   /nouveautes-1.json, nouveautes-2.json, …
+                                   /retraits-1.json, …
+                                   /motifs.json
+                                   /annees.json
+  public/snapshots/manifest.json   ← version courante, sha256 et taille de chaque fichier
+
+Le répertoire versionné ne change jamais de contenu (le hash fait partie du
+nom) : il peut être servi avec un cache immuable. Seul manifest.json est
+réécrit, en dernier et de façon atomique.
+
+Appelé automatiquement par ingest_to_supabase.py ; utilisable seul :
+  DATABASE_URL=... python scripts/export_snapshots.py [--out public/snapshots]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import unicodedata
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+DEFAULT_SNAPSHOT_DIR = Path(__file__).parent.parent / "public" / "snapshots"
+PAGE_SIZE = 50
+# Au-delà, l'application retombe sur PostgreSQL (voir lib/snapshots.ts)
+MAX_PAGES = 20
+KEEP_VERSIONS = 3
+
+# Colonnes des types Enregistrement / Retrait (lib/db.ts) : pas de SELECT *, les
+# colonnes internes (search_tokens, *_phon…) n'ont pas à finir dans un fichier public
+ENREGISTREMENT_COLUMNS = """
+    id, n_enreg, code, dci, nom_marque, forme, dosage, conditionnement, liste,
+    prescription, labo, pays, date_init, date_final, type_prod, statut,
+    stabilite, annee, source_version, is_new_vs_previous
+"""
+RETRAIT_COLUMNS = """
+    id, n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut,
+    date_retrait, motif_retrait
+"""
+
+LATEST_VERSION_SQL = """
+    SELECT version_label
+    FROM nomenclature_versions
+    ORDER BY reference_date DESC NULLS LAST, created_at DESC
+    LIMIT 1
+"""
+
+
+def log(msg, level="INFO"):
+    colors = {"INFO": "\033[94m", "OK": "\033[92m", "WARN": "\033[93m", "ERROR": "\033[91m"}
+    print(f"{colors.get(level, '')}[{level}] {msg}\033[0m")
+
+
+def json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+
+def encode(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+
+
+def slugify(label):
+    nfkd = unicodedata.normalize("NFKD", label or "sans-version")
+    ascii_str = "".join(c for c in nfkd if not unicodedata.combining(c)).lower()
+    return re.sub(r"[^a-z0-9]+", "-", ascii_str).strip("-") or "sans-version"
+
+
+def paginate(name, rows, page_size, max_pages):
+    """{nom-page: payload} ; `truncated` signale que des lignes n'ont pas été exportées."""
+    exported = rows[:page_size * max_pages]
+    pages = max(1, -(-len(exported) // page_size))
+    return {
+        f"{name}-{page}": {
+            "page": page,
+            "pages": pages,
+            "page_size": page_size,
+            "total": len(rows),
+            "truncated": len(rows) > len(exported),
+            "items": exported[(page - 1) * page_size:page * page_size],
+        }
+        for page in range(1, pages + 1)
+    }
+
+
+def collect_payloads(cur, page_size=PAGE_SIZE, max_pages=MAX_PAGES):
+    """Mêmes requêtes (et mêmes ordres de tri) que lib/queries.ts."""
+    cur.execute(LATEST_VERSION_SQL)
+    row = cur.fetchone()
+    version_label = row["version_label"] if row else None
+
+    # Note : abonnes_newsletter est figé à la date de l'export
+    cur.execute("SELECT * FROM v_stats")
+    stats = cur.fetchone()
+
+    cur.execute(f"""
+        SELECT {ENREGISTREMENT_COLUMNS} FROM enregistrements
+        WHERE is_new_vs_previous = TRUE AND source_version = %s
+        ORDER BY date_init DESC NULLS LAST, id DESC
+    """, (version_label,))
+    nouveautes = cur.fetchall()
+    if not nouveautes:
+        # Même repli que getLatestNouveautes() : bases sans drapeau exploitable
+        cur.execute(f"""
+            SELECT {ENREGISTREMENT_COLUMNS} FROM enregistrements
+            ORDER BY date_init DESC NULLS LAST, id DESC
+            LIMIT %s
+        """, (page_size * max_pages,))
+        nouveautes = cur.fetchall()
+
+    # Ordre de getRetraits() ; getLastRetraits() = les premières lignes datées
+    cur.execute(f"SELECT {RETRAIT_COLUMNS} FROM retraits ORDER BY date_retrait DESC NULLS LAST, id DESC")
+    retraits = cur.fetchall()
+
+    cur.execute("""
+        SELECT COALESCE(motif_retrait, 'Non précisé') AS motif, COUNT(*) AS n
+        FROM retraits
+        GROUP BY motif_retrait
+        ORDER BY n DESC
+        LIMIT 8
+    """)
+    # COUNT(*) est un BIGINT : node-postgres le rend en chaîne, on garde ce format
+    motifs = [{"motif": r["motif"], "n": str(r["n"])} for r in cur.fetchall()]
+
+    cur.execute("SELECT DISTINCT annee FROM enregistrements WHERE annee IS NOT NULL ORDER BY annee DESC")
+    annees = [r["annee"] for r in cur.fetchall()]
+
+    payloads = {"stats": stats, "motifs": motifs, "annees": annees}
+    payloads.update(paginate("nouveautes", nouveautes, page_size, max_pages))
+    payloads.update(paginate("retraits", retraits, page_size, max_pages))
+    return version_label, payloads
+
+
+def write_atomic(path: Path, data: bytes):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def prune_versions(out_dir: Path, keep: str, keep_count=KEEP_VERSIONS):
+    """Garde les derniers répertoires versionnés (pages encore en cache côté clients)."""
+    dirs = sorted((d for d in out_dir.iterdir() if d.is_dir() and d.name != keep),
+                  key=lambda d: d.stat().st_mtime, reverse=True)
+    for old in dirs[max(0, keep_count - 1):]:
+        shutil.rmtree(old)
+
+
+def export_snapshots(conn, out_dir: Path = DEFAULT_SNAPSHOT_DIR, page_size=PAGE_SIZE, max_pages=MAX_PAGES):
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    version_label, payloads = collect_payloads(cur, page_size, max_pages)
+    conn.commit()
+    cur.close()
+
+    encoded = {name: encode(payload) for name, payload in payloads.items()}
+    digests = {name: hashlib.sha256(data).hexdigest() for name, data in encoded.items()}
+    content_hash = hashlib.sha256("".join(digests[n] for n in sorted(digests)).encode()).hexdigest()[:12]
+    base = f"{slugify(version_label)}-{content_hash}"
+
+    target = out_dir / base
+    target.mkdir(parents=True, exist_ok=True)
+    for name, data in encoded.items():
+        write_atomic(target / f"{name}.json", data)
+
+    manifest = {
+        "version_label": version_label,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "base": base,
+        "page_size": page_size,
+        "files": {
+            name: {"path": f"{base}/{name}.json", "sha256": digests[name], "bytes": len(encoded[name])}
+            for name in sorted(encoded)
+        },
+    }
+    write_atomic(out_dir / "manifest.json", encode(manifest))
+    prune_versions(out_dir, base)
+
+    total = sum(len(d) for d in encoded.values())
+    log(f"Snapshots {base}: {len(encoded)} fichiers, {total / 1024:.0f} Ko → {out_dir}", "OK")
+    return manifest
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export JSON statique des lectures fréquentes")
+    parser.add_argument("--out", type=Path, default=DEFAULT_SNAPSHOT_DIR, help="Répertoire de sortie")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Lignes par page")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES, help="Pages maximum par liste")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    if not DATABASE_URL:
+        log("DATABASE_URL manquante", "ERROR")
+        sys.exit(1)
+
+    args = parse_args()
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        export_snapshots(conn, args.out, args.page_size, args.max_pages)
+    finally:
+        conn.close()
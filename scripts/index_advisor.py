@@ -0,0 +1,720 @@
+#!/usr/bin/env python3
+"""
+Conseiller d'index guidé par les requêtes réellement exécutées.
+
+Le schéma porte beaucoup d'index mono-colonne (idx_enreg_annee, idx_enreg_new,
+idx_enreg_statut, idx_enreg_pays…) que chaque ingestion doit maintenir, mais
+aucun index composite pour les combinaisons filtre + tri de
+getAllEnregistrements, getLatestNouveautes ou de la recherche avancée. Ce
+script :
+
+  1. lit pg_stat_statements (ou un log PostgreSQL capturé avec
+     log_min_duration_statement) d'une base locale ;
+  2. regroupe les requêtes en formes (littéraux et paramètres remplacés) ;
+  3. extrait par table les colonnes filtrées (égalité, intervalle, booléen
+     constant, IS NOT NULL, ILIKE, &&) et l'ORDER BY ;
+  4. propose les index composites / partiels absents, avec un gain estimé
+     (statistiques pg_stats ; coût EXPLAIN avec hypopg si disponible) ;
+  5. liste les index jamais utilisés et ceux rendus redondants ;
+  6. peut écrire la migration correspondante dans sql/.
+
+Usage:
+  DATABASE_URL=... python scripts/index_advisor.py
+  DATABASE_URL=... python scripts/index_advisor.py --log /var/log/postgresql/postgresql.log
+  DATABASE_URL=... python scripts/index_advisor.py --hypopg --emit-sql
+"""
+
+import argparse
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import errors
+
+from post_ingest_maintenance import INGESTED_TABLES
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+SQL_DIR = Path(__file__).parent.parent / "sql"
+TABLE_ABBREV = {"enregistrements": "enreg", "retraits": "retrait", "non_renouveles": "nonrenouv",
+                "nomenclature_versions": "versions"}
+# Lignes lues supposées quand l'ORDER BY est servi par l'index et la requête a un LIMIT paramétré
+ASSUMED_LIMIT = 50
+
+SUBQUERY_RE = re.compile(r"\(\s*SELECT\b", re.I)
+UNION_RE = re.compile(r"\bUNION(?:\s+ALL)?\b", re.I)
+FROM_RE = re.compile(
+    r"\b(FROM|JOIN)\s+([a-z_][\w.]*)(?:\s+(?:AS\s+)?(?!(?:WHERE|ORDER|GROUP|LIMIT|JOIN|LEFT|RIGHT|INNER|ON|UNION|CROSS)\b)([a-z_]\w*))?",
+    re.I,
+)
+WHERE_RE = re.compile(r"\bWHERE\b(.*?)(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bOFFSET\b|$)", re.I | re.S)
+ORDER_RE = re.compile(r"\bORDER\s+BY\b(.*?)(?=\bLIMIT\b|\bOFFSET\b|$)", re.I | re.S)
+COL = r"(?:([a-z_]\w*)\.)?([a-z_]\w*)"
+PREDICATES = (
+    ("bool", re.compile(rf"^{COL}\s*=\s*(TRUE|FALSE)$", re.I)),
+    ("eq", re.compile(rf"^{COL}\s*=\s*\?(?:::\w+)?$", re.I)),
+    ("eq", re.compile(rf"^{COL}\s+IN\s*\(\?\)$", re.I)),
+    ("notnull", re.compile(rf"^{COL}\s+IS\s+NOT\s+NULL$", re.I)),
+    ("range", re.compile(rf"^{COL}\s*(?:<|<=|>|>=)\s*\?(?:::\w+)?$", re.I)),
+    ("range", re.compile(rf"^{COL}\s+BETWEEN\s+\?~\?$", re.I)),
+    ("like", re.compile(rf"^{COL}\s+I?LIKE\s+\?$", re.I)),
+    ("trgm", re.compile(rf"^{COL}\s*%\s*\?$", re.I)),
+    ("array", re.compile(rf"^{COL}\s*(?:&&|@>)\s*\?(?:::[\w\[\]]+)?$", re.I)),
+)
+# Paramètre comparé à une colonne (alias.colonne op ?), typé d'après le catalogue
+PARAM_COMPARISON_RE = re.compile(
+    r"(?:\b\w+\.)?\b(\w+)\s*(?:=|<>|!=|<=|>=|<|>|&&|@>|%|\bI?LIKE\b|\bIN\s*\(|\bBETWEEN\b)\s*\?(?!::)"
+    r"(?:\s+AND\s+\?(?!::))?",
+    re.I,
+)
+ORDER_ITEM_RE = re.compile(rf"^{COL}(?:\s+(ASC|DESC))?(?:\s+NULLS\s+(FIRST|LAST))?$", re.I)
+
+
+def log(msg, level="INFO"):
+    colors = {"INFO": "\033[94m", "OK": "\033[92m", "WARN": "\033[93m", "ERROR": "\033[91m"}
+    print(f"{colors.get(level, '')}[{level}] {msg}\033[0m")
+
+
+# ─── Formes de requête ───────────────────────────────────────
+
+def normalize_statement(sql: str):
+    """Littéraux, $n et listes IN remplacés par ? ; espaces compactés."""
+    sql = re.sub(r"--[^\n]*", " ", sql)
+    sql = re.sub(r"/\*.*?\*/", " ", sql, flags=re.S)
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\$\d+", "?", sql)
+    sql = re.sub(r"(?<![\w.])-?\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\(\s*\?(?:\s*,\s*\?)+\s*\)", "(?)", sql)
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+@dataclass
+class Shape:
+    sql: str
+    calls: int = 0
+    total_ms: float = 0.0
+    rows: int = 0
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0.0
+
+
+def add_statement(shapes: dict, sql: str, calls: int, total_ms: float, rows: int = 0):
+    key = normalize_statement(sql)
+    shape = shapes.setdefault(key, Shape(key))
+    shape.calls += calls
+    shape.total_ms += total_ms
+    shape.rows += rows
+
+
+def shapes_from_pg_stat_statements(cur, min_calls: int):
+    cur.execute("SELECT * FROM pg_stat_statements LIMIT 0")
+    columns = {d[0] for d in cur.description}
+    # total_exec_time depuis PostgreSQL 13, total_time avant
+    total = "total_exec_time" if "total_exec_time" in columns else "total_time"
+    cur.execute(f"""
+        SELECT query, calls, {total}, rows
+        FROM pg_stat_statements
+        WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+          AND calls >= %s
+    """, (min_calls,))
+    shapes = {}
+    for query, calls, total_ms, rows in cur.fetchall():
+        add_statement(shapes, query, calls, total_ms, rows)
+    return shapes
+
+
+LOG_LINE_RE = re.compile(r"duration: ([\d.]+) ms\s+(?:statement|execute [^:]*):\s?(.*)")
+# Préfixe log_line_prefix typique : "2025-12-01 10:00:00.000 UTC [123] user@db LOG:  "
+LOG_START_RE = re.compile(r"^\S.*?\b(LOG|ERROR|WARNING|DETAIL|STATEMENT|HINT|CONTEXT):\s")
+
+
+def shapes_from_log(path: Path, min_calls: int):
+    """Lignes "duration: … ms statement: …" (log_min_duration_statement), suites multi-lignes comprises."""
+    shapes, current = {}, None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            m = LOG_LINE_RE.search(line)
+            if m:
+                if current:
+                    add_statement(shapes, current[1], 1, current[0])
+                current = [float(m.group(1)), m.group(2)]
+            elif current and not LOG_START_RE.match(line):
+                current[1] += "\n" + line.rstrip("\n")
+            elif current:
+                add_statement(shapes, current[1], 1, current[0])
+                current = None
+    if current:
+        add_statement(shapes, current[1], 1, current[0])
+    return {k: s for k, s in shapes.items() if s.calls >= min_calls}
+
+
+# ─── Analyse d'une forme ─────────────────────────────────────
+
+def split_blocks(sql: str):
+    """Sous-requêtes extraites (remplacées par ?) et branches UNION séparées : un SELECT simple par bloc."""
+    blocks = []
+    while (m := SUBQUERY_RE.search(sql)):
+        depth = 0
+        for end in range(m.start(), len(sql)):
+            depth += {"(": 1, ")": -1}.get(sql[end], 0)
+            if depth == 0:
+                break
+        blocks.extend(split_blocks(sql[m.start() + 1:end]))
+        sql = sql[:m.start()] + "?" + sql[end + 1:]
+    blocks.extend(part.strip() for part in UNION_RE.split(sql) if part.strip())
+    return blocks
+
+
+def split_top_level(text: str, sep_re):
+    parts, depth, start = [], 0, 0
+    for m in re.finditer(rf"\(|\)|{sep_re}", text, re.I):
+        token = m.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            parts.append(text[start:m.start()])
+            start = m.end()
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def strip_parens(text: str):
+    while text.startswith("(") and text.endswith(")"):
+        inner = text[1:-1]
+        if split_top_level(inner, r"\)\s*\(") != [inner.strip()]:
+            break
+        depth = 0
+        balanced = True
+        for c in inner:
+            depth += {"(": 1, ")": -1}.get(c, 0)
+            if depth < 0:
+                balanced = False
+                break
+        if not balanced:
+            break
+        text = inner.strip()
+    return text
+
+
+@dataclass
+class Usage:
+    table: str
+    eq: list = field(default_factory=list)
+    range: list = field(default_factory=list)
+    bool: list = field(default_factory=list)      # [(colonne, TRUE/FALSE)]
+    notnull: list = field(default_factory=list)
+    like: list = field(default_factory=list)
+    array: list = field(default_factory=list)
+    order: list = field(default_factory=list)     # [(colonne, desc, nulls_last)]
+    limit: bool = False
+
+
+def analyze_block(block: str, columns: dict):
+    """Retourne les Usage des tables connues d'un bloc SELECT."""
+    aliases = {}
+    for _, table, alias in FROM_RE.findall(block):
+        table = table.split(".")[-1].lower()
+        if table in columns:
+            aliases[table] = table
+            if alias:
+                aliases[alias.lower()] = table
+    if not aliases:
+        return []
+    tables = sorted(set(aliases.values()))
+    usages = {t: Usage(t) for t in tables}
+
+    def resolve(alias, column):
+        column = column.lower()
+        if alias:
+            table = aliases.get(alias.lower())
+            return (table, column) if table and column in columns[table] else (None, None)
+        owners = [t for t in tables if column in columns[t]]
+        return (owners[0], column) if len(owners) == 1 else (None, None)
+
+    where = WHERE_RE.search(block)
+    if where:
+        clause = re.sub(r"BETWEEN\s+\?\s+AND\s+\?", "BETWEEN ?~?", where.group(1), flags=re.I)
+        for conjunct in split_top_level(clause, r"\bAND\b"):
+            conjunct = strip_parens(conjunct)
+            # Un OR n'est pas exploitable par un index composite ; on garde les LIKE pour le trigramme
+            terms = split_top_level(conjunct, r"\bOR\b")
+            for term in terms:
+                term = strip_parens(term)
+                for kind, pattern in PREDICATES:
+                    m = pattern.match(term)
+                    if not m:
+                        continue
+                    table, column = resolve(m.group(1), m.group(2))
+                    if not table or (len(terms) > 1 and kind not in ("like", "trgm", "array")):
+                        break
+                    usage = usages[table]
+                    if kind == "bool":
+                        usage.bool.append((column, m.group(3).upper()))
+                    elif kind == "trgm":
+                        usage.like.append(column)
+                    else:
+                        getattr(usage, kind).append(column)
+                    break
+
+    order = ORDER_RE.search(block)
+    if order:
+        for item in split_top_level(order.group(1), ","):
+            m = ORDER_ITEM_RE.match(item.strip())
+            table, column = resolve(m.group(1), m.group(2)) if m else (None, None)
+            if not table or (usages[table].order and usages[table].order[0][0] is None):
+                break
+            desc = (m.group(3) or "").upper() == "DESC"
+            nulls = (m.group(4) or "").upper()
+            nulls_last = (nulls == "LAST") if nulls else not desc
+            usages[table].order.append((column, desc, nulls_last))
+        # Tri sur plusieurs tables ou expression : l'index ne peut pas le servir
+        if len({u.table for u in usages.values() if u.order}) > 1:
+            for u in usages.values():
+                u.order = []
+    limit = bool(re.search(r"\bLIMIT\b", block, re.I))
+    for u in usages.values():
+        u.limit = limit
+    return list(usages.values())
+
+
+# ─── Catalogue ───────────────────────────────────────────────
+
+@dataclass
+class Index:
+    name: str
+    table: str
+    method: str
+    columns: list          # [(colonne ou expression, desc, nulls_last)]
+    predicate: str | None
+    unique: bool
+    scans: int
+    size: int
+    definition: str
+
+
+def normalize_predicate(text):
+    if not text:
+        return None
+    text = re.sub(r"[()\s]", "", text.lower())
+    return re.sub(r"=true$", "", text)
+
+
+def parse_index_columns(spec: str):
+    columns = []
+    for item in split_top_level(spec, ","):
+        m = re.match(r"^([a-z_]\w*)(?:\s+\w+_ops)?(?:\s+(ASC|DESC))?(?:\s+NULLS\s+(FIRST|LAST))?$", item.strip(), re.I)
+        if not m:
+            columns.append((item.strip(), False, True))
+            continue
+        desc = (m.group(2) or "").upper() == "DESC"
+        nulls = (m.group(3) or "").upper()
+        columns.append((m.group(1).lower(), desc, (nulls == "LAST") if nulls else not desc))
+    return columns
+
+
+def load_catalog(cur, tables):
+    # {table: {colonne: type}} ; le type sert à typer les paramètres de EXPLAIN (GENERIC_PLAN)
+    cur.execute("""
+        SELECT c.relname, a.attname, format_type(a.atttypid, NULL)
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        WHERE c.relnamespace = current_schema()::regnamespace AND c.relname = ANY(%s)
+          AND a.attnum > 0 AND NOT a.attisdropped
+    """, (list(tables),))
+    columns = {}
+    for table, column, data_type in cur.fetchall():
+        columns.setdefault(table, {})[column] = data_type
+
+    cur.execute("""
+        SELECT s.relname, s.indexrelname, s.idx_scan, pg_relation_size(s.indexrelid),
+               i.indisunique OR i.indisprimary, pg_get_indexdef(s.indexrelid)
+        FROM pg_stat_user_indexes s
+        JOIN pg_index i ON i.indexrelid = s.indexrelid
+        WHERE s.relname = ANY(%s)
+    """, (list(tables),))
+    indexes = []
+    for table, name, scans, size, unique, definition in cur.fetchall():
+        m = re.search(r"USING (\w+) \((.*?)\)(?: WHERE (.*))?$", definition)
+        method, spec, predicate = (m.group(1), m.group(2), m.group(3)) if m else ("?", "", None)
+        indexes.append(Index(name, table, method, parse_index_columns(spec), normalize_predicate(predicate),
+                             unique, scans, size, definition))
+
+    cur.execute("SELECT relname, GREATEST(reltuples, 0)::BIGINT FROM pg_class WHERE relname = ANY(%s) AND relkind = 'r'",
+                (list(tables),))
+    row_counts = dict(cur.fetchall())
+
+    cur.execute("""
+        SELECT tablename, attname, n_distinct, most_common_vals::TEXT, most_common_freqs
+        FROM pg_stats WHERE schemaname = current_schema() AND tablename = ANY(%s)
+    """, (list(tables),))
+    stats = {}
+    for table, column, n_distinct, mcv, freqs in cur.fetchall():
+        stats[(table, column)] = {"n_distinct": n_distinct, "mcv": mcv, "freqs": freqs or []}
+    return columns, indexes, row_counts, stats
+
+
+# ─── Suggestions ─────────────────────────────────────────────
+
+@dataclass
+class Candidate:
+    table: str
+    method: str
+    columns: list          # [(colonne, desc|None, nulls_last|None)] ; None = égalité (sens indifférent)
+    predicate: str | None
+    shapes: list = field(default_factory=list)
+    total_ms: float = 0.0
+    saved_ms: float = 0.0
+    how: str = "pg_stats"
+
+    @property
+    def key(self):
+        return self.table, self.method, tuple(self.columns), self.predicate
+
+    def column_sql(self):
+        parts = []
+        for column, desc, nulls_last in self.columns:
+            if self.method == "gin" and column.endswith(":trgm"):
+                parts.append(f"{column[:-5]} gin_trgm_ops")
+            elif desc is None or (not desc and nulls_last):
+                parts.append(column)
+            elif desc:
+                parts.append(f"{column} DESC NULLS LAST" if nulls_last else f"{column} DESC")
+            else:
+                parts.append(f"{column} NULLS FIRST")
+        return ", ".join(parts)
+
+    def name(self):
+        cols = "_".join(c.split(":")[0] for c, _, _ in self.columns)
+        suffix = "_trgm" if self.method == "gin" and self.columns[0][0].endswith(":trgm") else ""
+        partial = "_partial" if self.predicate else ""
+        return f"idx_{TABLE_ABBREV.get(self.table, self.table)}_{cols}{suffix}{partial}"[:63]
+
+    def sql(self):
+        using = f" USING {self.method}" if self.method != "btree" else ""
+        where = f" WHERE {self.predicate}" if self.predicate else ""
+        return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name()} ON {self.table}{using} ({self.column_sql()}){where};"
+
+
+def distinct_values(stats, rows, table, column):
+    nd = (stats.get((table, column)) or {}).get("n_distinct")
+    if nd is None:
+        return 10.0
+    return max(1.0, -nd * rows if nd < 0 else nd)
+
+
+def bool_fraction(stats, table, column, value):
+    s = stats.get((table, column)) or {}
+    vals = (s.get("mcv") or "{}").strip("{}").split(",")
+    for v, f in zip(vals, s.get("freqs") or []):
+        if v.strip().lower() in (("t", "true") if value == "TRUE" else ("f", "false")):
+            return f
+    return 0.5
+
+
+def candidates_for(usage: Usage, stats, rows):
+    """Index btree composite (égalités, puis tri ou intervalle), partiel sur booléens / IS NOT NULL ; GIN sinon."""
+    found = []
+    eq = sorted(dict.fromkeys(usage.eq), key=lambda c: -distinct_values(stats, rows, usage.table, c))
+    predicate_parts = [c if v == "TRUE" else f"NOT {c}" for c, v in usage.bool]
+    predicate_parts += [f"{c} IS NOT NULL" for c in dict.fromkeys(usage.notnull)]
+    predicate = " AND ".join(predicate_parts) or None
+
+    columns = [(c, None, None) for c in eq]
+    if usage.order:
+        columns += [o for o in usage.order if o[0] not in eq]
+    elif usage.range:
+        columns.append((usage.range[0], False, True))
+    if columns:
+        found.append(Candidate(usage.table, "btree", columns, predicate))
+    for column in dict.fromkeys(usage.like):
+        found.append(Candidate(usage.table, "gin", [(f"{column}:trgm", None, None)], None))
+    for column in dict.fromkeys(usage.array):
+        found.append(Candidate(usage.table, "gin", [(column, None, None)], None))
+    return found
+
+
+def is_covered(candidate: Candidate, indexes):
+    for index in indexes:
+        if index.table != candidate.table or index.method != candidate.method:
+            continue
+        if index.predicate and index.predicate != normalize_predicate(candidate.predicate):
+            continue
+        if candidate.method == "gin":
+            wanted = candidate.columns[0][0].split(":")[0]
+            trgm = candidate.columns[0][0].endswith(":trgm")
+            if index.columns and index.columns[0][0] == wanted and ("gin_trgm_ops" in index.definition) == trgm:
+                return index
+            continue
+        if len(index.columns) < len(candidate.columns):
+            continue
+        # Parcours avant ou arrière de l'index : toutes les colonnes triées dans le même sens
+        for reverse in (False, True):
+            ok = True
+            for (col, desc, nulls_last), (icol, idesc, inulls_last) in zip(candidate.columns, index.columns):
+                if col != icol:
+                    ok = False
+                    break
+                if desc is None:
+                    continue
+                if reverse:
+                    idesc, inulls_last = not idesc, not inulls_last
+                if (desc, nulls_last) != (idesc, inulls_last):
+                    ok = False
+                    break
+            if ok:
+                return index
+    return None
+
+
+def estimate_gain(candidate: Candidate, usage: Usage, indexes, stats, rows):
+    """
+    Fraction des lignes lues économisée (borne haute) : lignes lues aujourd'hui
+    (index mono-colonne existant sur la 1re égalité, sinon table entière)
+    contre lignes lues avec l'index proposé.
+    """
+    if candidate.method == "gin":
+        return 0.9 if rows > 1000 else 0.0
+    selectivity = 1.0
+    for column, desc, _ in candidate.columns:
+        if desc is None:
+            selectivity /= distinct_values(stats, rows, usage.table, column)
+    for column, value in usage.bool:
+        selectivity *= bool_fraction(stats, usage.table, column, value)
+    now = float(rows)
+    for column, _, _ in candidate.columns[:1]:
+        if any(i.table == usage.table and i.method == "btree" and i.columns and i.columns[0][0] == column
+               for i in indexes):
+            now = rows / distinct_values(stats, rows, usage.table, column)
+    after = rows * selectivity
+    if usage.order and usage.limit:
+        after = min(after, ASSUMED_LIMIT)
+    if now <= 0:
+        return 0.0
+    return max(0.0, min(1.0, 1 - after / now))
+
+
+def typed_parameters(sql: str, table: str, columns: dict):
+    """
+    ? comparé à une colonne connue → $n::type de la colonne ; les autres restent
+    $n et PostgreSQL en déduit le type s'il le peut (pas pour "? = ?").
+    """
+    def column_type(column):
+        column = column.lower()
+        if column in columns.get(table, {}):
+            return columns[table][column]
+        types = {cols[column] for cols in columns.values() if column in cols}
+        return types.pop() if len(types) == 1 else None
+
+    def cast(m):
+        data_type = column_type(m.group(1))
+        return m.group(0).replace("?", f"?::{data_type}") if data_type else m.group(0)
+
+    sql = PARAM_COMPARISON_RE.sub(cast, sql)
+    return re.sub(r"\?", lambda _m, c=iter(range(1, 1000)): f"${next(c)}", sql)
+
+
+def hypopg_gain(cur, candidate: Candidate, shape: Shape, columns: dict):
+    """
+    Gain de coût via index hypothétique (hypopg + EXPLAIN GENERIC_PLAN, PostgreSQL 16+).
+    Chaque essai tourne dans un savepoint : un EXPLAIN refusé (paramètre qu'aucune
+    colonne ne permet de typer, version trop ancienne) n'annule pas la suite de
+    l'analyse ; None signale une forme non mesurée.
+    """
+    sql = typed_parameters(shape.sql, candidate.table, columns)
+    cur.execute("SAVEPOINT hypopg_probe")
+    try:
+        cur.execute(f"EXPLAIN (FORMAT JSON, GENERIC_PLAN) {sql}")
+        before = cur.fetchone()[0][0]["Plan"]["Total Cost"]
+        cur.execute("SELECT indexrelid FROM hypopg_create_index(%s)",
+                    (candidate.sql().replace(" CONCURRENTLY IF NOT EXISTS", "").rstrip(";"),))
+        cur.execute(f"EXPLAIN (FORMAT JSON, GENERIC_PLAN) {sql}")
+        after = cur.fetchone()[0][0]["Plan"]["Total Cost"]
+        return max(0.0, 1 - after / before) if before else 0.0
+    except psycopg2.Error:
+        cur.execute("ROLLBACK TO SAVEPOINT hypopg_probe")
+        return None
+    finally:
+        # Les index hypothétiques vivent en mémoire du backend, hors transaction
+        cur.execute("SELECT hypopg_reset()")
+        cur.execute("RELEASE SAVEPOINT hypopg_probe")
+
+
+def advise(cur, shapes: dict, tables, use_hypopg=False, min_gain_ms=1.0):
+    columns, indexes, row_counts, stats = load_catalog(cur, tables)
+    candidates, covered, unmeasured = {}, {}, set()
+    for shape in sorted(shapes.values(), key=lambda s: -s.total_ms):
+        for block in split_blocks(shape.sql):
+            for usage in analyze_block(block, columns):
+                rows = row_counts.get(usage.table, 0)
+                for candidate in candidates_for(usage, stats, rows):
+                    existing = is_covered(candidate, indexes)
+                    if existing:
+                        covered.setdefault(existing.name, set()).add(shape.sql)
+                        continue
+                    gain = hypopg_gain(cur, candidate, shape, columns) if use_hypopg else None
+                    how = "hypopg" if gain is not None else "pg_stats"
+                    if gain is None:
+                        if use_hypopg:
+                            how = "pg_stats, non mesuré par hypopg"
+                            unmeasured.add(shape.sql)
+                        gain = estimate_gain(candidate, usage, indexes, stats, rows)
+                    c = candidates.setdefault(candidate.key, candidate)
+                    # Une seule forme non mesurée suffit à nuancer le gain affiché
+                    if c.shapes and c.how != how:
+                        how = "hypopg + pg_stats, non mesuré pour certaines formes"
+                    c.how = how
+                    if shape.sql not in c.shapes:
+                        c.shapes.append(shape.sql)
+                        c.total_ms += shape.total_ms
+                        c.saved_ms += shape.total_ms * gain
+    for sql in sorted(unmeasured):
+        log(f"hypopg : forme non mesurée (EXPLAIN GENERIC_PLAN refusé), gain estimé par pg_stats : {sql[:110]}", "WARN")
+    suggestions = sorted((c for c in candidates.values() if c.saved_ms >= min_gain_ms), key=lambda c: -c.saved_ms)
+
+    unused = [i for i in indexes if i.scans == 0 and not i.unique and i.name not in covered]
+    # Index btree dont les colonnes sont le préfixe d'un autre (ou d'une suggestion non partielle)
+    redundant = []
+    for index in indexes:
+        if index.unique or index.method != "btree" or index.predicate:
+            continue
+        names = [c[0] for c in index.columns]
+        wider = [o.name for o in indexes if o is not index and o.table == index.table and o.method == "btree"
+                 and not o.predicate and [c[0] for c in o.columns][:len(names)] == names and len(o.columns) > len(names)]
+        wider += [s.name() for s in suggestions if s.table == index.table and s.method == "btree" and not s.predicate
+                  and [c[0] for c in s.columns][:len(names)] == names and len(s.columns) > len(names)]
+        if wider:
+            redundant.append((index, wider))
+    return suggestions, unused, redundant
+
+
+# ─── Sortie ──────────────────────────────────────────────────
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.1f} Mo" if size >= 1024 * 1024 else f"{size / 1024:.0f} Ko"
+
+
+def print_report(shapes, suggestions, unused, redundant, top: int):
+    print("\nFormes de requête (temps total décroissant)")
+    for shape in sorted(shapes.values(), key=lambda s: -s.total_ms)[:top]:
+        print(f"  {shape.total_ms:>10.1f} ms  {shape.calls:>7} appels  {shape.mean_ms:>8.2f} ms/appel  {shape.sql[:110]}")
+
+    print("\nIndex suggérés")
+    if not suggestions:
+        print("  (aucun)")
+    for s in suggestions:
+        print(f"  {s.sql()}")
+        print(f"      gain estimé ≈ {s.saved_ms:.1f} ms sur {s.total_ms:.1f} ms ({s.how}), {len(s.shapes)} forme(s)")
+
+    print("\nIndex jamais utilisés (idx_scan = 0 depuis la dernière remise à zéro des statistiques)")
+    if not unused:
+        print("  (aucun)")
+    for i in unused:
+        print(f"  {i.name:<32} {i.table:<16} {format_size(i.size):>9}")
+
+    print("\nIndex redondants")
+    if not redundant:
+        print("  (aucun)")
+    for index, wider in redundant:
+        print(f"  {index.name:<32} couvert par {', '.join(wider)}")
+    print()
+
+
+def next_migration_path():
+    numbers = [int(m.group(1)) for p in SQL_DIR.glob("*.sql") if (m := re.match(r"(\d+)_", p.name))]
+    return SQL_DIR / f"{max(numbers, default=0) + 1:02d}_index_advisor.sql"
+
+
+def write_migration(path: Path, suggestions, unused, redundant):
+    lines = [
+        "-- ============================================================",
+        "-- PharmaVeille DZ — Index proposés par scripts/index_advisor.py",
+        "-- À relire avant application. CREATE/DROP INDEX CONCURRENTLY ne peut",
+        "-- pas tourner dans une transaction : exécuter avec psql sans -1.",
+        "-- Les suppressions sont commentées : vérifier sur la production que",
+        "-- les statistiques d'usage couvrent une période représentative.",
+        "-- ============================================================",
+        "",
+    ]
+    for s in suggestions:
+        lines.append(f"-- gain estimé ≈ {s.saved_ms:.1f} ms sur {s.total_ms:.1f} ms ({s.how})")
+        for sql in s.shapes[:3]:
+            lines.append(f"--   {sql[:100]}")
+        lines.append(s.sql())
+        lines.append("")
+    if unused or redundant:
+        lines.append("-- ─── Suppressions candidates ─────────────────────────────────")
+    for i in unused:
+        lines.append(f"-- DROP INDEX CONCURRENTLY IF EXISTS {i.name};  -- jamais utilisé, {format_size(i.size)}")
+    for index, wider in redundant:
+        if index in unused:
+            continue
+        lines.append(f"-- DROP INDEX CONCURRENTLY IF EXISTS {index.name};  -- couvert par {', '.join(wider)}")
+    path.write_text("\n".join(lines).rstrip() + "\n", encoding="utf-8")
+    log(f"Migration écrite : {path}", "OK")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Conseiller d'index guidé par pg_stat_statements ou un log")
+    parser.add_argument("--log", type=Path, default=None, help="Log PostgreSQL (log_min_duration_statement) à la place de pg_stat_statements")
+    parser.add_argument("--tables", nargs="+", default=list(INGESTED_TABLES), help="Tables analysées")
+    parser.add_argument("--min-calls", type=int, default=1, help="Ignorer les formes moins appelées")
+    parser.add_argument("--top", type=int, default=15, help="Formes affichées")
+    parser.add_argument("--min-gain-ms", type=float, default=1.0, help="Ne pas proposer d'index au gain estimé inférieur")
+    parser.add_argument("--hypopg", action="store_true", help="Estimer le gain avec des index hypothétiques (hypopg)")
+    parser.add_argument("--emit-sql", type=Path, nargs="?", const=True, default=None, metavar="FICHIER",
+                        help="Écrire la migration (défaut : prochain numéro libre dans sql/)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    if not DATABASE_URL:
+        log("DATABASE_URL manquante", "ERROR")
+        sys.exit(1)
+
+    args = parse_args()
+    conn = psycopg2.connect(DATABASE_URL)
+    created_hypopg = False
+    try:
+        cur = conn.cursor()
+        if args.log:
+            shapes = shapes_from_log(args.log, args.min_calls)
+        else:
+            try:
+                shapes = shapes_from_pg_stat_statements(cur, args.min_calls)
+            except errors.UndefinedTable:
+                log("pg_stat_statements indisponible : shared_preload_libraries = 'pg_stat_statements' "
+                    "puis CREATE EXTENSION pg_stat_statements ; ou passe --log", "ERROR")
+                sys.exit(1)
+        conn.rollback()
+        if args.hypopg:
+            # Validée tout de suite : les rollbacks de l'analyse ne doivent pas la défaire
+            try:
+                cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'hypopg')")
+                if not cur.fetchone()[0]:
+                    cur.execute("CREATE EXTENSION hypopg")
+                    created_hypopg = True
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+                log("hypopg indisponible : estimation par pg_stats", "WARN")
+                args.hypopg = False
+        log(f"{len(shapes)} forme(s) de requête analysée(s)")
+        suggestions, unused, redundant = advise(cur, shapes, args.tables, args.hypopg, args.min_gain_ms)
+        conn.rollback()
+    finally:
+        if created_hypopg:
+            conn.rollback()
+            conn.cursor().execute("DROP EXTENSION IF EXISTS hypopg")
+            conn.commit()
+        conn.close()
+
+    print_report(shapes, suggestions, unused, redundant, args.top)
+    if args.emit_sql:
+        write_migration(next_migration_path() if args.emit_sql is True else args.emit_sql,
+                        suggestions, unused, redundant)
@@ -9,18 +9,67 @@ Usage:
 """
 
 import argparse
+import hashlib
+import json
 import os
+import pickle
 import re
 import sys
+import time
+from datetime import date, timedelta
+from numbers import Real
 from pathlib import Path
 
 import pandas as pd
 import psycopg2
 from psycopg2 import errors
-from psycopg2.extras import execute_values
+from psycopg2.extras import Json, execute_values
+
+from export_snapshots import DEFAULT_SNAPSHOT_DIR, export_snapshots
+from phonetic import add_search_keys
+from post_ingest_maintenance import run_maintenance
+from record_linkage import link_records, write_linkage_report
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
 DEFAULT_DATA_DIR = Path(__file__).parent.parent / "data"
+DEFAULT_LINKAGE_REPORT = DEFAULT_DATA_DIR / "linkage_report.csv"
+CHANGE_FEED_SQL = Path(__file__).parent.parent / "sql" / "05_change_events.sql"
+STAGING_SQL = Path(__file__).parent.parent / "sql" / "06_ingest_staging.sql"
+PHONETIC_SQL = Path(__file__).parent.parent / "sql" / "07_phonetic_search.sql"
+RUN_CACHE_DIR = DEFAULT_DATA_DIR / ".ingest_runs"
+# Jour 0 des numéros de série Excel (le 29/02/1900 fictif d'Excel est absorbé)
+EXCEL_EPOCH = date(1899, 12, 30)
+DEFAULT_CHUNK_SIZE = 2000
+
+# Colonnes chargées, dans l'ordre des tuples produits par prepare_ingest()
+# Clés de recherche tolérante (scripts/phonetic.py), ajoutées en fin de tuple
+SEARCH_KEY_COLUMNS = ("nom_marque_phon", "dci_phon", "search_tokens")
+ENREG_COLUMNS = (
+    "n_enreg", "code", "dci", "nom_marque", "forme", "dosage", "conditionnement", "liste",
+    "prescription", "obs", "labo", "pays", "date_init", "date_final", "type_prod", "statut",
+    "stabilite", "annee", "source_version", "is_new_vs_previous", *SEARCH_KEY_COLUMNS,
+)
+RETRAIT_COLUMNS = (
+    "n_enreg", "code", "dci", "nom_marque", "forme", "dosage", "conditionnement", "liste",
+    "prescription", "labo", "pays", "date_init", "type_prod", "statut", "date_retrait", "motif_retrait",
+    *SEARCH_KEY_COLUMNS,
+)
+NON_RENOUV_COLUMNS = (
+    "n_enreg", "code", "dci", "nom_marque", "forme", "dosage", "conditionnement", "liste",
+    "prescription", "labo", "pays", "date_init", "date_final", "type_prod", "statut",
+    *SEARCH_KEY_COLUMNS,
+)
+LOADED_TABLES = (
+    ("enregistrements", ENREG_COLUMNS),
+    ("retraits", RETRAIT_COLUMNS),
+    ("non_renouveles", NON_RENOUV_COLUMNS),
+)
+
+# Champs comparés pour les évènements "modification" (même n_enreg, contenu différent)
+MODIFIABLE_FIELDS = (
+    "dci", "nom_marque", "forme", "dosage", "conditionnement", "liste", "prescription",
+    "labo", "pays", "date_final", "type_prod", "statut",
+)
 
 
 def log(msg, level="INFO"):
@@ -38,7 +87,15 @@ def clean_str(val):
 def clean_date(val):
     if pd.isna(val):
         return None
+    # Mêmes règles que cleanDate() (lib/excel-parser.ts), vérifiées par parser_parity.py
+    if isinstance(val, str) and re.fullmatch(r"\d+(\.\d+)?", val.strip()):
+        val = float(val)  # numéro de série Excel stocké en texte
     try:
+        if isinstance(val, Real) and not isinstance(val, bool):
+            return EXCEL_EPOCH + timedelta(days=int(val)) if val >= 1 else None
+        if isinstance(val, str) and re.match(r"\s*\d{4}-\d{2}-\d{2}", val):
+            # dayfirst lirait 2018-07-03 comme le 7 mars
+            return pd.to_datetime(val.strip()[:10], format="%Y-%m-%d").date()
         return pd.to_datetime(val, dayfirst=True).date()
     except Exception:
         return None
@@ -91,73 +148,139 @@ def read_table(filepath: Path, sheet_name: str):
     return pd.read_excel(filepath, sheet_name=sheet_name, header=header_row)
 
 
-def parse_enregistrements(filepath: Path):
+# Disposition des feuilles MIPH : (champ, index de colonne sous l'en-tête, nettoyage)
+ENREG_LAYOUT = (
+    ("n_enreg", 1, clean_n_enreg), ("code", 2, clean_str), ("dci", 3, clean_str), ("nom_marque", 4, clean_str),
+    ("forme", 5, clean_str), ("dosage", 6, clean_str), ("conditionnement", 7, clean_str), ("liste", 8, clean_str),
+    ("prescription", 9, clean_str), ("obs", 11, clean_str), ("labo", 12, clean_str), ("pays", 13, clean_str),
+    ("date_init", 14, clean_date), ("date_final", 15, clean_date), ("type_prod", 16, clean_str),
+    ("statut", 17, clean_str), ("stabilite", 18, clean_str),
+)
+NON_RENOUV_LAYOUT = (
+    ("n_enreg", 1, clean_n_enreg), ("code", 2, clean_str), ("dci", 3, clean_str), ("nom_marque", 4, clean_str),
+    ("forme", 5, clean_str), ("dosage", 6, clean_str), ("conditionnement", 7, clean_str), ("liste", 8, clean_str),
+    ("prescription", 9, clean_str), ("labo", 11, clean_str), ("pays", 12, clean_str),
+    ("date_init", 13, clean_date), ("date_final", 14, clean_date), ("type_prod", 15, clean_str),
+    ("statut", 16, clean_str),
+)
+RETRAIT_LAYOUT = (
+    ("n_enreg", 1, clean_n_enreg), ("code", 2, clean_str), ("dci", 3, clean_str), ("nom_marque", 4, clean_str),
+    ("forme", 5, clean_str), ("dosage", 6, clean_str), ("conditionnement", 7, clean_str), ("liste", 8, clean_str),
+    ("prescription", 9, clean_str), ("labo", 11, clean_str), ("pays", 12, clean_str),
+    ("date_init", 13, clean_date), ("type_prod", 14, clean_str), ("statut", 15, clean_str),
+    ("date_retrait", 16, clean_date), ("motif_retrait", 17, clean_str),
+)
+# (table, nom de feuille recherché, disposition)
+SHEETS = (
+    ("enregistrements", "Nomenclature", ENREG_LAYOUT),
+    ("non_renouveles", "Non Renouvel", NON_RENOUV_LAYOUT),
+    ("retraits", "Retraits", RETRAIT_LAYOUT),
+)
+
+
+def apply_layout(values, layout):
+    """Ligne brute (valeurs par position) → {champ: valeur nettoyée} ; colonne absente = None."""
+    return {field: clean(values[i] if i < len(values) else None) for field, i, clean in layout}
+
+
+def is_data_row(values):
+    """Même filtre que les parseurs : N° d'enregistrement et DCI renseignés."""
+    return len(values) > 3 and not pd.isna(values[1]) and not pd.isna(values[3])
+
+
+def parse_sheet(filepath: Path, needle: str, layout):
     wb = pd.ExcelFile(filepath)
-    sheet = detect_sheet(wb, "Nomenclature")
+    sheet = detect_sheet(wb, needle)
     df = read_table(filepath, sheet)
-    cols = list(df.columns)
-    df = df[df[cols[1]].notna() & df[cols[3]].notna()]
-
-    rows = []
-    for _, r in df.iterrows():
-        rows.append({
-            "n_enreg": clean_n_enreg(r[cols[1]]),
-            "code": clean_str(r[cols[2]]),
-            "dci": clean_str(r[cols[3]]),
-            "nom_marque": clean_str(r[cols[4]]),
-            "forme": clean_str(r[cols[5]]),
-            "dosage": clean_str(r[cols[6]]),
-            "conditionnement": clean_str(r[cols[7]]),
-            "liste": clean_str(r[cols[8]]),
-            "prescription": clean_str(r[cols[9]]),
-            "obs": clean_str(r[cols[11]] if len(cols) > 11 else None),
-            "labo": clean_str(r[cols[12]] if len(cols) > 12 else None),
-            "pays": clean_str(r[cols[13]] if len(cols) > 13 else None),
-            "date_init": clean_date(r[cols[14]] if len(cols) > 14 else None),
-            "date_final": clean_date(r[cols[15]] if len(cols) > 15 else None),
-            "type_prod": clean_str(r[cols[16]] if len(cols) > 16 else None),
-            "statut": clean_str(r[cols[17]] if len(cols) > 17 else None),
-            "stabilite": clean_str(r[cols[18]] if len(cols) > 18 else None),
-        })
+    rows = [apply_layout(values, layout) for values in df.itertuples(index=False, name=None) if is_data_row(values)]
     return rows, sheet
 
 
+def parse_enregistrements(filepath: Path):
+    return parse_sheet(filepath, "Nomenclature", ENREG_LAYOUT)
+
+
 def parse_non_renouveles(filepath: Path):
-    wb = pd.ExcelFile(filepath)
-    sheet = detect_sheet(wb, "Non Renouvel")
-    df = read_table(filepath, sheet)
-    cols = list(df.columns)
-    df = df[df[cols[1]].notna() & df[cols[3]].notna()]
-
-    rows = []
-    for _, r in df.iterrows():
-        rows.append((
-            clean_n_enreg(r[cols[1]]), clean_str(r[cols[2]]), clean_str(r[cols[3]]), clean_str(r[cols[4]]),
-            clean_str(r[cols[5]]), clean_str(r[cols[6]]), clean_str(r[cols[7]]), clean_str(r[cols[8]]),
-            clean_str(r[cols[9]]), clean_str(r[cols[11]] if len(cols) > 11 else None), clean_str(r[cols[12]] if len(cols) > 12 else None),
-            clean_date(r[cols[13]] if len(cols) > 13 else None), clean_date(r[cols[14]] if len(cols) > 14 else None),
-            clean_str(r[cols[15]] if len(cols) > 15 else None), clean_str(r[cols[16]] if len(cols) > 16 else None),
-        ))
-    return rows
+    rows, _ = parse_sheet(filepath, "Non Renouvel", NON_RENOUV_LAYOUT)
+    return [tuple(r.values()) for r in rows]
 
 
 def parse_retraits(filepath: Path):
-    wb = pd.ExcelFile(filepath)
-    sheet = detect_sheet(wb, "Retraits")
-    df = read_table(filepath, sheet)
-    cols = list(df.columns)
-    df = df[df[cols[1]].notna() & df[cols[3]].notna()]
-
-    rows = []
-    for _, r in df.iterrows():
-        rows.append((
-            clean_n_enreg(r[cols[1]]), clean_str(r[cols[2]]), clean_str(r[cols[3]]), clean_str(r[cols[4]]),
-            clean_str(r[cols[5]]), clean_str(r[cols[6]]), clean_str(r[cols[7]]), clean_str(r[cols[8]]),
-            clean_str(r[cols[9]]), clean_str(r[cols[11]]), clean_str(r[cols[12]]),
-            clean_date(r[cols[13]]), clean_str(r[cols[14]]), clean_str(r[cols[15]]),
-            clean_date(r[cols[16]]), clean_str(r[cols[17]] if len(cols) > 17 else None),
-        ))
-    return rows
+    rows, _ = parse_sheet(filepath, "Retraits", RETRAIT_LAYOUT)
+    return [tuple(r.values()) for r in rows]
+
+
+def scan_sheet(ws, layout, sample: int, header_scan: int = 20):
+    """
+    Lecture en flux (openpyxl read_only) : en-tête cherché dans les
+    `header_scan` premières lignes, puis au plus `sample` lignes de données.
+    """
+    rows = ws.iter_rows(values_only=True)
+    header_idx, header = None, ()
+    for i, values in enumerate(rows):
+        if i >= header_scan:
+            break
+        if any("ENREGISTREMENT" in str(v).upper() for v in values if v is not None):
+            header_idx, header = i, values
+            break
+    if header_idx is None:
+        return {"header_row": None}
+
+    samples = []
+    for values in rows:
+        if len(samples) >= sample:
+            break
+        if is_data_row(values):
+            samples.append(apply_layout(values, layout))
+
+    mapping = [(field, i, header[i] if i < len(header) else None) for field, i, _ in layout]
+    # max_row vient de la balise <dimension> : approximatif (lignes vides / de pied incluses)
+    approx = ws.max_row - header_idx - 1 if ws.max_row else None
+    return {"header_row": header_idx + 1, "mapping": mapping, "samples": samples, "approx_rows": approx}
+
+
+def preview_workbook(filepath: Path, sample: int = 5, label: str | None = None):
+    """Vérifie un fichier sans le parser en entier ni toucher la base."""
+    from openpyxl import load_workbook
+
+    started = time.perf_counter()
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    label = label or infer_version_from_filename(filepath)
+    log(f"Fichier : {filepath.name}")
+    log(f"Version déduite : {label} (date de référence : {parse_reference_date(label) or 'inconnue'})")
+    log(f"Feuilles : {', '.join(wb.sheetnames)}")
+
+    ok = True
+    for table, needle, layout in SHEETS:
+        matches = [name for name in wb.sheetnames if needle.upper() in name.upper()]
+        if not matches:
+            log(f"{table} : aucune feuille contenant « {needle} »", "ERROR")
+            ok = False
+            continue
+        if len(matches) > 1:
+            log(f"{table} : plusieurs feuilles candidates {matches}, « {matches[0]} » sera utilisée", "WARN")
+
+        info = scan_sheet(wb[matches[0]], layout, sample)
+        if info["header_row"] is None:
+            log(f"{table} / {matches[0]} : en-tête « ENREGISTREMENT » introuvable", "ERROR")
+            ok = False
+            continue
+
+        log(f"{table} / « {matches[0]} » : en-tête ligne {info['header_row']}, ~{info['approx_rows']} lignes", "OK")
+        for field, i, title in info["mapping"]:
+            print(f"    col {i:>2}  {field:<16} ← {str(title).strip() if title is not None else '(absente)'}")
+        n_enreg_title = str(info["mapping"][0][2] or "").upper()
+        if "ENREGISTREMENT" not in n_enreg_title:
+            log(f"{table} : la colonne 1 (« {n_enreg_title} ») n'est pas le N° d'enregistrement", "WARN")
+            ok = False
+        for row in info["samples"]:
+            print("    · " + " | ".join(f"{k}={v}" for k, v in row.items() if v is not None))
+        if not info["samples"]:
+            log(f"{table} : aucune ligne de données après l'en-tête", "WARN")
+
+    wb.close()
+    log(f"Aperçu en {time.perf_counter() - started:.2f}s", "OK" if ok else "WARN")
+    return ok
 
 
 def identity_key(r: dict):
@@ -166,6 +289,11 @@ def identity_key(r: dict):
     return f"F::{r['code']}::{r['dci']}::{r['nom_marque']}::{r['dosage']}"
 
 
+def tuple_identity_key(row: tuple):
+    """identity_key() pour les tuples de parse_retraits / parse_non_renouveles."""
+    return identity_key({"n_enreg": row[0], "code": row[1], "dci": row[2], "nom_marque": row[3], "dosage": row[5]})
+
+
 def infer_version_from_filename(filepath: Path):
     base = filepath.stem.replace('_', ' ').replace('-', ' ')
     m = re.search(r"(janvier|f[eé]vrier|mars|avril|mai|juin|juillet|ao[uû]t|septembre|octobre|novembre|d[eé]cembre)\s*(20\d{2})", base, re.I)
@@ -214,56 +342,179 @@ def ensure_schema_compatibility(cur):
             cur.execute(f'RELEASE SAVEPOINT "{savepoint}"')
 
 
-def ingest(conn, current_file: Path, previous_file: Path | None, current_label: str, previous_label: str | None):
-    cur = conn.cursor()
-    ensure_schema_compatibility(cur)
+def load_previous_snapshot(cur, previous_file: Path | None, prev_rows: list):
+    """
+    État de référence du flux de changements : le fichier précédent s'il est
+    fourni, sinon le contenu de la base avant rechargement.
+    """
+    if previous_file:
+        return {
+            "enregistrements": prev_rows,
+            "retraits": {tuple_identity_key(r) for r in parse_retraits(previous_file)},
+            "non_renouveles": {tuple_identity_key(r) for r in parse_non_renouveles(previous_file)},
+        }
+
+    cur.execute(f"SELECT n_enreg, code, {', '.join(MODIFIABLE_FIELDS)} FROM enregistrements")
+    columns = [d[0] for d in cur.description]
+    enregistrements = [dict(zip(columns, row)) for row in cur.fetchall()]
+    snapshot = {"enregistrements": enregistrements}
+    for table in ("retraits", "non_renouveles"):
+        cur.execute(f"SELECT n_enreg, code, dci, nom_marque, forme, dosage FROM {table}")
+        snapshot[table] = {tuple_identity_key(r) for r in cur.fetchall()}
+    return snapshot
+
+
+def build_change_events(current_rows: list, retraits: list, non_renouveles: list, previous: dict, current_label: str,
+                        links: dict | None = None):
+    """
+    Évènements du flux append-only, sous forme de tuples prêts pour l'INSERT.
+    La dedup_key rend l'insertion idempotente : ré-ingérer la même version
+    (ou revoir le même retrait) ne notifie pas deux fois.
+    Les lignes rapprochées par link_records() (links) produisent une
+    "modification" et non une nouveauté.
+    """
+    links = links or {}
+    if not previous["enregistrements"]:
+        # Première ingestion : tout serait "nouveau", on ne notifie rien.
+        return []
+
+    prev_by_key = {identity_key(r): r for r in previous["enregistrements"]}
+    events = {}
+
+    def add(event_type, discriminant, key, row, motif=None, event_date=None, payload=None):
+        dedup_key = f"{event_type}::{key}::{discriminant}"
+        events[dedup_key] = (
+            event_type, dedup_key, key, current_label, row["n_enreg"], row["dci"], row["nom_marque"],
+            row["dosage"], row["labo"], motif, event_date, payload,
+        )
+
+    for i, r in enumerate(current_rows):
+        key = identity_key(r)
+        prev = prev_by_key.get(key)
+        if prev is None and i in links:
+            prev = previous["enregistrements"][links[i][0]]
+        if prev is None:
+            add("nouveau", current_label, key, r, event_date=r["date_init"])
+        elif key.startswith("N::") or i in links:
+            changes = {f: [prev.get(f), r[f]] for f in MODIFIABLE_FIELDS if prev.get(f) != r[f]}
+            if identity_key(prev) != key:
+                changes["identity_key"] = [identity_key(prev), key]
+            if changes:
+                add("modification", current_label, key, r, payload={"champs": changes})
+
+    for row in retraits:
+        key = tuple_identity_key(row)
+        if key not in previous["retraits"]:
+            as_dict = {"n_enreg": row[0], "dci": row[2], "nom_marque": row[3], "dosage": row[5], "labo": row[9]}
+            add("retrait", row[14], key, as_dict, motif=row[15], event_date=row[14])
+
+    for row in non_renouveles:
+        key = tuple_identity_key(row)
+        if key not in previous["non_renouveles"]:
+            as_dict = {"n_enreg": row[0], "dci": row[2], "nom_marque": row[3], "dosage": row[5], "labo": row[9]}
+            add("non_renouvele", row[12], key, as_dict, event_date=row[12])
+
+    return list(events.values())
+
+
+def with_search_keys(rows: list):
+    """Ajoute (nom_marque_phon, dci_phon, search_tokens) ; dci en 3e, nom_marque en 4e position."""
+    keys = add_search_keys(rows, lambda r: r[3], lambda r: r[2])
+    return [(*row, *k) for row, k in zip(rows, keys)]
+
+
+def publish_change_events(cur, events: list):
+    """Ajoute les évènements au flux ; retourne le nombre réellement inséré."""
+    cur.execute(CHANGE_FEED_SQL.read_text(encoding="utf-8"))
+    if not events:
+        return 0
+    events = [(*e[:-1], Json(e[-1], dumps=lambda o: json.dumps(o, default=str)) if e[-1] else None) for e in events]
+    inserted = execute_values(cur, """
+      INSERT INTO nomenclature_changes
+      (event_type, dedup_key, identity_key, version_label, n_enreg, dci, nom_marque,
+       dosage, labo, motif_retrait, event_date, payload)
+      VALUES %s
+      ON CONFLICT (dedup_key) DO NOTHING
+      RETURNING seq
+    """, events, fetch=True)
+    return len(inserted)
 
+
+def prepare_ingest(cur, current_file: Path, previous_file: Path | None, current_label: str, previous_label: str | None,
+                   linkage_report: Path | None = None):
+    """
+    Parse les fichiers et calcule tout ce qui sera publié (lignes, nouveautés,
+    évènements du flux), sans rien écrire dans les tables publiques.
+    """
     current_rows, sheet_name = parse_enregistrements(current_file)
     prev_rows = parse_enregistrements(previous_file)[0] if previous_file else []
+    retraits = parse_retraits(current_file)
+    non_renouveles = parse_non_renouveles(current_file)
+
+    # Lu avant le TRUNCATE quand il n'y a pas de fichier précédent
+    previous = load_previous_snapshot(cur, previous_file, prev_rows)
+
+    # Rapprochement des lignes sans clé commune (n_enreg absent, retouche cosmétique, renumérotation)
+    links, ambiguous = link_records(current_rows, previous["enregistrements"], identity_key)
+    if links or ambiguous:
+        log(f"Rapprochement: {len(links)} ligne(s) liée(s), {len(ambiguous)} cas ambigu(s)")
+        if linkage_report:
+            write_linkage_report(linkage_report, current_rows, previous["enregistrements"], links, ambiguous)
+            log(f"Rapport de rapprochement: {linkage_report}")
 
     prev_keys = {identity_key(r) for r in prev_rows}
+    # Sans --previous, le drapeau garde son comportement historique (tout est nouveau)
+    linked = set(links) if previous_file else set()
     enreg_payload = []
     current_year = parse_reference_date(current_label).year if parse_reference_date(current_label) else None
 
-    for r in current_rows:
+    for i, r in enumerate(current_rows):
         enreg_payload.append((
             r["n_enreg"], r["code"], r["dci"], r["nom_marque"], r["forme"], r["dosage"], r["conditionnement"],
             r["liste"], r["prescription"], r["obs"], r["labo"], r["pays"], r["date_init"], r["date_final"],
             r["type_prod"], r["statut"], r["stabilite"], current_year, current_label,
-            identity_key(r) not in prev_keys,
+            identity_key(r) not in prev_keys and i not in linked,
         ))
 
-    retraits = parse_retraits(current_file)
-    non_renouveles = parse_non_renouveles(current_file)
-
     n_enreg_lengths = [len(r["n_enreg"]) for r in current_rows if r.get("n_enreg")]
     if n_enreg_lengths:
         log(f"Longueur max n_enreg détectée: {max(n_enreg_lengths)}")
 
-    cur.execute("TRUNCATE TABLE enregistrements RESTART IDENTITY CASCADE")
-    execute_values(cur, """
-      INSERT INTO enregistrements
-      (n_enreg, code, dci, nom_marque, forme, dosage, conditionnement, liste,
-       prescription, obs, labo, pays, date_init, date_final, type_prod, statut,
-       stabilite, annee, source_version, is_new_vs_previous)
-      VALUES %s
-    """, enreg_payload)
+    return {
+        "sheet_name": sheet_name,
+        "rows": {
+            "enregistrements": with_search_keys(enreg_payload),
+            "retraits": with_search_keys(retraits),
+            "non_renouveles": with_search_keys(non_renouveles),
+        },
+        "version": (
+            current_label,
+            parse_reference_date(current_label),
+            previous_label,
+            len(enreg_payload),
+            sum(1 for row in enreg_payload if row[-1]),
+        ),
+        "events": build_change_events(current_rows, retraits, non_renouveles, previous, current_label, links),
+    }
 
-    cur.execute("TRUNCATE TABLE retraits RESTART IDENTITY CASCADE")
-    execute_values(cur, """
-      INSERT INTO retraits
-      (n_enreg, code, dci, nom_marque, forme, dosage, conditionnement, liste,
-       prescription, labo, pays, date_init, type_prod, statut, date_retrait, motif_retrait)
-      VALUES %s
-    """, retraits)
 
-    cur.execute("TRUNCATE TABLE non_renouveles RESTART IDENTITY CASCADE")
-    execute_values(cur, """
-      INSERT INTO non_renouveles
-      (n_enreg, code, dci, nom_marque, forme, dosage, conditionnement, liste,
-       prescription, labo, pays, date_init, date_final, type_prod, statut)
-      VALUES %s
-    """, non_renouveles)
+def publish(cur, payload: dict, run_id: str | None = None):
+    """
+    Remplace le contenu des tables publiques. Avec run_id, les lignes sont
+    recopiées depuis les tables staging_* (mode --resumable) au lieu d'être
+    envoyées depuis le client. Retourne le nombre d'évènements ajoutés au flux.
+    """
+    cur.execute(PHONETIC_SQL.read_text(encoding="utf-8"))
+    for table, columns in LOADED_TABLES:
+        cols = ", ".join(columns)
+        cur.execute(f"TRUNCATE TABLE {table} RESTART IDENTITY CASCADE")
+        if run_id is None:
+            execute_values(cur, f"INSERT INTO {table} ({cols}) VALUES %s", payload["rows"][table])
+        else:
+            cur.execute(
+                f"INSERT INTO {table} ({cols}) SELECT {cols} FROM staging_{table} WHERE run_id = %s ORDER BY row_no",
+                (run_id,),
+            )
 
     cur.execute("TRUNCATE TABLE nomenclature_versions RESTART IDENTITY CASCADE")
     cur.execute(
@@ -272,22 +523,239 @@ def ingest(conn, current_file: Path, previous_file: Path | None, current_label:
           (version_label, reference_date, previous_label, total_enregistrements, total_nouveautes)
         VALUES (%s, %s, %s, %s, %s)
         """,
-        (
-            current_label,
-            parse_reference_date(current_label),
-            previous_label,
-            len(enreg_payload),
-            sum(1 for row in enreg_payload if row[-1]),
-        ),
+        payload["version"],
+    )
+
+    # Même transaction que le rechargement : le flux n'est visible qu'avec les données
+    return publish_change_events(cur, payload["events"])
+
+
+def log_ingest_summary(payload: dict, published: int):
+    rows = payload["rows"]
+    log(f"Feuille active détectée: {payload['sheet_name']}")
+    log(f"Enregistrements: {len(rows['enregistrements'])}", "OK")
+    log(f"Nouveautés vs précédente: {payload['version'][-1]}", "OK")
+    log(f"Retraits: {len(rows['retraits'])}", "OK")
+    log(f"Non renouvelés: {len(rows['non_renouveles'])}", "OK")
+    log(f"Évènements publiés dans le flux: {published} (déjà connus: {len(payload['events']) - published})", "OK")
+
+
+def ingest(conn, current_file: Path, previous_file: Path | None, current_label: str, previous_label: str | None,
+           maintenance: bool = True, linkage_report: Path | None = None,
+           snapshot_dir: Path | None = None):
+    cur = conn.cursor()
+    ensure_schema_compatibility(cur)
+
+    payload = prepare_ingest(cur, current_file, previous_file, current_label, previous_label, linkage_report)
+    published = publish(cur, payload)
+
+    conn.commit()
+    cur.close()
+    log_ingest_summary(payload, published)
+
+    if maintenance:
+        # Statistiques fraîches + index chauds avant les premières recherches
+        run_maintenance(conn)
+    if snapshot_dir:
+        refresh_snapshots(conn, snapshot_dir)
+
+
+def refresh_snapshots(conn, snapshot_dir: Path):
+    """Export après publication : un échec ne doit pas faire échouer une ingestion déjà commitée."""
+    try:
+        export_snapshots(conn, snapshot_dir)
+    except (psycopg2.Error, OSError) as exc:
+        if not conn.closed:
+            conn.rollback()
+        log(f"Export des snapshots en échec : {str(exc).strip().splitlines()[0]}", "ERROR")
+        log("Données publiées, mais les snapshots servis restent ceux de l'ingestion précédente (périmés). "
+            f"Relance : python scripts/export_snapshots.py --out {snapshot_dir}", "WARN")
+
+
+# ─── Mode reprise (--resumable) ───────────────────────────────
+
+def default_run_id(current_file: Path, previous_file: Path | None, current_label: str, previous_label: str | None):
+    """Même fichiers + mêmes libellés = même run : relancer la commande reprend là où elle s'est arrêtée."""
+    h = hashlib.sha256()
+    for path in (current_file, previous_file):
+        if path:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+    h.update(f"{current_label}|{previous_label}".encode())
+    return h.hexdigest()[:16]
+
+
+def load_or_prepare(conn, run_id: str, current_file: Path, previous_file: Path | None, current_label: str,
+                    previous_label: str | None, linkage_report: Path | None):
+    """Le parsing n'est fait qu'une fois par run : le résultat est mis en cache localement."""
+    cache = RUN_CACHE_DIR / f"{run_id}.pickle"
+    if cache.exists():
+        log(f"Run {run_id}: parsing déjà effectué, reprise depuis {cache}")
+        with open(cache, "rb") as f:
+            return pickle.load(f)
+
+    cur = conn.cursor()
+    ensure_schema_compatibility(cur)
+    payload = prepare_ingest(cur, current_file, previous_file, current_label, previous_label, linkage_report)
+    conn.commit()
+    cur.close()
+
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(payload, f)
+    tmp.replace(cache)
+    return payload
+
+
+def run_status(conn, run_id: str):
+    """Statut du run ('loading', 'published'), None s'il n'existe pas encore."""
+    cur = conn.cursor()
+    cur.execute(STAGING_SQL.read_text(encoding="utf-8"))
+    cur.execute("SELECT status FROM ingest_runs WHERE run_id = %s", (run_id,))
+    row = cur.fetchone()
+    conn.commit()
+    cur.close()
+    return row[0] if row else None
+
+
+def reset_run(conn, run_id: str):
+    """Oublie un run (lots et lignes staging partent en cascade) pour le recharger de zéro."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM ingest_runs WHERE run_id = %s", (run_id,))
+    conn.commit()
+    cur.close()
+
+
+def stage_chunks(conn, run_id: str, payload: dict, chunk_size: int):
+    """
+    Charge les lignes dans les tables staging_* par lots, chacun dans sa propre
+    transaction avec son marqueur dans ingest_run_chunks. Les lots déjà
+    confirmés sont sautés ; la taille de lot d'origine du run est conservée
+    pour que les bornes coïncident. Retourne False si le run est déjà publié.
+    """
+    cur = conn.cursor()
+    cur.execute(STAGING_SQL.read_text(encoding="utf-8"))
+    cur.execute(PHONETIC_SQL.read_text(encoding="utf-8"))
+    cur.execute(
+        """
+        INSERT INTO ingest_runs (run_id, version_label, chunk_size) VALUES (%s, %s, %s)
+        ON CONFLICT (run_id) DO UPDATE SET chunk_size = COALESCE(ingest_runs.chunk_size, EXCLUDED.chunk_size)
+        """,
+        (run_id, payload["version"][0], chunk_size),
     )
+    cur.execute("SELECT status, chunk_size FROM ingest_runs WHERE run_id = %s", (run_id,))
+    status, run_chunk_size = cur.fetchone()
+    conn.commit()
+    if status == "published":
+        cur.close()
+        return False
+    if run_chunk_size != chunk_size:
+        log(f"Run {run_id}: reprise avec la taille de lot d'origine ({run_chunk_size}, demandé {chunk_size})", "WARN")
+        chunk_size = run_chunk_size
+
+    cur.execute("SELECT table_name, chunk_no FROM ingest_run_chunks WHERE run_id = %s", (run_id,))
+    done = set(cur.fetchall())
+    conn.commit()
 
+    loaded = skipped = 0
+    for table, columns in LOADED_TABLES:
+        rows = payload["rows"][table]
+        for chunk_no, start in enumerate(range(0, len(rows), chunk_size)):
+            if (table, chunk_no) in done:
+                skipped += 1
+                continue
+            chunk = rows[start:start + chunk_size]
+            execute_values(
+                cur,
+                f"INSERT INTO staging_{table} (run_id, row_no, {', '.join(columns)}) VALUES %s",
+                [(run_id, start + k, *row) for k, row in enumerate(chunk)],
+            )
+            cur.execute(
+                "INSERT INTO ingest_run_chunks (run_id, table_name, chunk_no, row_count) VALUES (%s, %s, %s, %s)",
+                (run_id, table, chunk_no, len(chunk)),
+            )
+            conn.commit()
+            loaded += 1
+        log(f"Run {run_id}: {table} en staging ({len(rows)} lignes)")
+    log(f"Run {run_id}: {loaded} lot(s) chargé(s), {skipped} lot(s) déjà confirmé(s)", "OK")
+    cur.close()
+    return True
+
+
+def publish_run(conn, run_id: str, payload: dict):
+    """Publication atomique : staging → tables publiques, puis nettoyage, en une transaction."""
+    cur = conn.cursor()
+    for table, _ in LOADED_TABLES:
+        cur.execute(f"SELECT COUNT(*) FROM staging_{table} WHERE run_id = %s", (run_id,))
+        staged = cur.fetchone()[0]
+        if staged != len(payload["rows"][table]):
+            raise RuntimeError(f"Run {run_id}: {table} incomplet en staging ({staged}/{len(payload['rows'][table])})")
+
+    published = publish(cur, payload, run_id=run_id)
+    cur.execute("UPDATE ingest_runs SET status = 'published', published_at = NOW() WHERE run_id = %s", (run_id,))
+    for table, _ in LOADED_TABLES:
+        cur.execute(f"DELETE FROM staging_{table} WHERE run_id = %s", (run_id,))
+    cur.execute("DELETE FROM ingest_run_chunks WHERE run_id = %s", (run_id,))
+    # Runs abandonnés : leurs lignes staging / marqueurs partent en cascade
+    cur.execute("DELETE FROM ingest_runs WHERE status = 'loading' AND created_at < NOW() - INTERVAL '7 days'")
     conn.commit()
     cur.close()
-    log(f"Feuille active détectée: {sheet_name}")
-    log(f"Enregistrements: {len(enreg_payload)}", "OK")
-    log(f"Nouveautés vs précédente: {sum(1 for row in enreg_payload if row[-1])}", "OK")
-    log(f"Retraits: {len(retraits)}", "OK")
-    log(f"Non renouvelés: {len(non_renouveles)}", "OK")
+    return published
+
+
+def ingest_resumable(connect, current_file: Path, previous_file: Path | None, current_label: str,
+                     previous_label: str | None, run_id: str | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     retries: int = 5, maintenance: bool = True, linkage_report: Path | None = None,
+                     snapshot_dir: Path | None = None, republish: bool = False):
+    """
+    Ingestion tolérante aux coupures réseau : parsing mis en cache, chargement
+    en staging par lots confirmés, publication atomique. Sur perte de
+    connexion, reconnecte et reprend (jusqu'à `retries` fois) ; relancer la
+    même commande plus tard reprend aussi au dernier lot confirmé.
+    Un run déjà publié n'est rechargé qu'avec `republish` (ex. pour écraser
+    un import fait entre-temps via /admin).
+    """
+    run_id = run_id or default_run_id(current_file, previous_file, current_label, previous_label)
+    log(f"Ingestion reprenable — run {run_id}")
+    attempt = 0
+    while True:
+        conn = None
+        try:
+            conn = connect()
+            if run_status(conn, run_id) == "published":
+                if not republish:
+                    log(f"Run {run_id} déjà publié — rien à faire (--republish pour recharger)", "WARN")
+                    return run_id
+                log(f"Run {run_id} déjà publié — rechargement demandé")
+                reset_run(conn, run_id)
+                # Une reprise après coupure ne doit pas recommencer une publication déjà faite
+                republish = False
+            payload = load_or_prepare(conn, run_id, current_file, previous_file, current_label, previous_label,
+                                      linkage_report)
+            if stage_chunks(conn, run_id, payload, chunk_size):
+                log_ingest_summary(payload, publish_run(conn, run_id, payload))
+            else:
+                log(f"Run {run_id} déjà publié — rien à faire (--republish pour recharger)", "WARN")
+            (RUN_CACHE_DIR / f"{run_id}.pickle").unlink(missing_ok=True)
+            if maintenance:
+                run_maintenance(conn)
+            if snapshot_dir:
+                refresh_snapshots(conn, snapshot_dir)
+            return run_id
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as exc:
+            attempt += 1
+            if attempt > retries:
+                log(f"Connexion perdue, abandon après {retries} reprise(s). Relance la même commande pour reprendre.",
+                    "ERROR")
+                raise
+            delay = min(60, 2 ** attempt)
+            log(f"Connexion perdue ({str(exc).strip()}) — reprise {attempt}/{retries} dans {delay}s", "WARN")
+            time.sleep(delay)
+        finally:
+            if conn is not None:
+                conn.close()
 
 
 def parse_args():
@@ -296,6 +764,23 @@ def parse_args():
     parser.add_argument("--previous", type=Path, default=None, help="Fichier nomenclature précédent (.xlsx)")
     parser.add_argument("--current-label", type=str, default=None, help="Libellé version courante (ex: Décembre 2025)")
     parser.add_argument("--previous-label", type=str, default=None, help="Libellé version précédente")
+    parser.add_argument("--linkage-report", type=Path, default=DEFAULT_LINKAGE_REPORT,
+                        help="CSV des rapprochements entre versions (liens retenus et cas ambigus)")
+    parser.add_argument("--skip-maintenance", action="store_true",
+                        help="Ne pas lancer ANALYZE / maintenance des index après l'ingestion")
+    parser.add_argument("--snapshot-dir", type=Path, default=DEFAULT_SNAPSHOT_DIR,
+                        help="Répertoire des snapshots JSON statiques (défaut: public/snapshots)")
+    parser.add_argument("--skip-snapshots", action="store_true", help="Ne pas exporter les snapshots JSON")
+    parser.add_argument("--resumable", action="store_true",
+                        help="Chargement par lots confirmés en staging, reprise automatique après coupure")
+    parser.add_argument("--run-id", type=str, default=None,
+                        help="Identifiant du run à reprendre (défaut : dérivé des fichiers et libellés)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Lignes par lot en mode --resumable")
+    parser.add_argument("--retries", type=int, default=5, help="Reconnexions automatiques en mode --resumable")
+    parser.add_argument("--republish", action="store_true",
+                        help="Mode --resumable : recharger un run déjà publié (ex. après un import /admin)")
+    parser.add_argument("--preview", type=int, nargs="?", const=5, default=None, metavar="N",
+                        help="Aperçu sans base : feuilles, en-têtes, colonnes et N lignes d'exemple (défaut 5)")
     args = parser.parse_args()
 
     if args.current is None:
@@ -311,10 +796,6 @@ def parse_args():
 
 
 if __name__ == "__main__":
-    if not DATABASE_URL:
-        log("DATABASE_URL manquante", "ERROR")
-        sys.exit(1)
-
     args = parse_args()
     if not args.current.exists():
         log(f"Fichier introuvable: {args.current}", "ERROR")
@@ -323,9 +804,33 @@ if __name__ == "__main__":
         log(f"Fichier introuvable: {args.previous}", "ERROR")
         sys.exit(1)
 
+    if args.preview is not None:
+        # Aucun accès base : DATABASE_URL n'est pas requise
+        results = [
+            preview_workbook(path, args.preview, label)
+            for path, label in ((args.current, args.current_label), (args.previous, args.previous_label)) if path
+        ]
+        sys.exit(0 if all(results) else 1)
+
+    if not DATABASE_URL:
+        log("DATABASE_URL manquante", "ERROR")
+        sys.exit(1)
+
+    if args.resumable:
+        ingest_resumable(lambda: psycopg2.connect(DATABASE_URL), args.current, args.previous,
+                         args.current_label, args.previous_label, run_id=args.run_id, chunk_size=args.chunk_size,
+                         retries=args.retries, maintenance=not args.skip_maintenance,
+                         linkage_report=args.linkage_report,
+                         snapshot_dir=None if args.skip_snapshots else args.snapshot_dir,
+                         republish=args.republish)
+        log("Ingestion terminée", "OK")
+        sys.exit(0)
+
     conn = psycopg2.connect(DATABASE_URL)
     try:
-        ingest(conn, args.current, args.previous, args.current_label, args.previous_label)
+        ingest(conn, args.current, args.previous, args.current_label, args.previous_label,
+               maintenance=not args.skip_maintenance, linkage_report=args.linkage_report,
+               snapshot_dir=None if args.skip_snapshots else args.snapshot_dir)
         log("Ingestion terminée", "OK")
     finally:
         conn.close()
@@ -0,0 +1,57 @@
+#!/usr/bin/env node
+/**
+ * Worker Node de scripts/parser_parity.py
+ * Parse un classeur avec lib/excel-parser.ts (le parseur de /api/admin/upload)
+ * et écrit le résultat en JSON sur stdout. Le TypeScript est transpilé à la
+ * volée avec la devDependency typescript : pas de build Next nécessaire.
+ *
+ * Usage : node scripts/parse_excel_node.js <fichier.xlsx> [libellé]
+ */
+
+const fs = require('fs')
+const path = require('path')
+const Module = require('module')
+const ts = require('typescript')
+
+function loadTs(file) {
+  const { outputText } = ts.transpileModule(fs.readFileSync(file, 'utf8'), {
+    compilerOptions: { module: ts.ModuleKind.CommonJS, target: ts.ScriptTarget.ES2020, esModuleInterop: true },
+    fileName: file,
+  })
+  const mod = new Module(file, module)
+  mod.filename = file
+  // Résoudre 'xlsx' depuis le node_modules du projet
+  mod.paths = Module._nodeModulePaths(path.dirname(file))
+  mod._compile(outputText, file)
+  return mod.exports
+}
+
+const [file, label] = process.argv.slice(2)
+if (!file) {
+  process.stderr.write('Usage : node scripts/parse_excel_node.js <fichier.xlsx> [libellé]\n')
+  process.exit(2)
+}
+
+const parser = loadTs(path.join(__dirname, '..', 'lib', 'excel-parser.ts'))
+const buffer = fs.readFileSync(file)
+
+const started = process.hrtime.bigint()
+const parsed = parser.parseNomenclatureFile(buffer, path.basename(file), label || undefined)
+const parseMs = Number(process.hrtime.bigint() - started) / 1e6
+
+const tables = {
+  enregistrements: parsed.enregistrements,
+  retraits: parsed.retraits,
+  non_renouveles: parsed.nonRenouveles,
+}
+
+process.stdout.write(JSON.stringify({
+  version_label: parsed.versionLabel,
+  reference_date: parser.parseReferenceDate(parsed.versionLabel),
+  parse_ms: parseMs,
+  peak_rss_kb: process.resourceUsage().maxRSS,
+  tables: Object.fromEntries(Object.entries(tables).map(([name, rows]) => [
+    name,
+    rows.map((row) => ({ ...row, identity_key: parser.identityKey(row) })),
+  ])),
+}))
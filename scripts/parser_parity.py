@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Parité et vitesse des deux parseurs de la nomenclature MIPH.
+
+Un même classeur peut être chargé par scripts/ingest_to_supabase.py (pandas)
+ou par /api/admin/upload (lib/excel-parser.ts). Les deux ont leur propre
+nettoyage (clean_date / cleanDate…), leur identity_key / identityKey et leur
+parseReferenceDate. Ce script les exécute sur le même corpus :
+
+  - classeurs synthétiques (synthetic_nomenclature.build_workbook) ;
+  - un classeur "cas limites" (dates texte / série Excel, espaces, codes
+    numériques, lignes à moitié vides) ;
+  - les vrais fichiers passés en argument ;
+
+compare les sorties ligne à ligne (appariement par N° d'enregistrement, ou
+par code + DCI + marque + dosage à défaut) et relève pour chaque parseur la
+durée de parsing et le pic mémoire (RSS), chacun dans son propre processus.
+
+Code de sortie 1 si une différence n'est pas déjà connue de la référence, ou
+si un parseur régresse en temps ou en mémoire.
+
+Usage:
+  python scripts/parser_parity.py --synthetic 6000 data/nomenclature_decembre_2025.xlsx
+  python scripts/parser_parity.py --synthetic 6000 --save-baseline data/parity_baseline.json
+  python scripts/parser_parity.py --synthetic 6000 --baseline data/parity_baseline.json
+
+Prérequis côté Node : npm install (xlsx + typescript).
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+from ingest_to_supabase import (
+    NON_RENOUV_LAYOUT, RETRAIT_LAYOUT, identity_key, infer_version_from_filename, log,
+    parse_enregistrements, parse_non_renouveles, parse_reference_date, parse_retraits,
+)
+from synthetic_nomenclature import build_workbook
+
+NODE_WORKER = Path(__file__).parent / "parse_excel_node.js"
+TABLES = ("enregistrements", "retraits", "non_renouveles")
+MAX_EXAMPLES = 5
+
+
+# ─── Workers (un processus par parseur : pic mémoire isolé) ───
+
+def to_json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()[:10]
+    return value
+
+
+def python_worker(path: Path, label: str | None):
+    started = time.perf_counter()
+    enregistrements, _ = parse_enregistrements(path)
+    retraits = parse_retraits(path)
+    non_renouveles = parse_non_renouveles(path)
+    parse_ms = (time.perf_counter() - started) * 1000
+
+    fields = {
+        "retraits": [f for f, _, _ in RETRAIT_LAYOUT],
+        "non_renouveles": [f for f, _, _ in NON_RENOUV_LAYOUT],
+    }
+    tables = {
+        "enregistrements": enregistrements,
+        "retraits": [dict(zip(fields["retraits"], r)) for r in retraits],
+        "non_renouveles": [dict(zip(fields["non_renouveles"], r)) for r in non_renouveles],
+    }
+    label = label or infer_version_from_filename(path)
+    reference = parse_reference_date(label)
+    return {
+        "version_label": label,
+        "reference_date": reference.isoformat() if reference else None,
+        "parse_ms": parse_ms,
+        # ru_maxrss est en Ko sous Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "tables": {
+            name: [{**{k: to_json_value(v) for k, v in row.items()}, "identity_key": identity_key(row)} for row in rows]
+            for name, rows in tables.items()
+        },
+    }
+
+
+def run_worker(cmd):
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(map(str, cmd))} a échoué :\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout)
+
+
+def run_parsers(path: Path, label: str | None):
+    py_cmd = [sys.executable, __file__, "--worker", str(path)] + (["--label", label] if label else [])
+    node_cmd = ["node", str(NODE_WORKER), str(path)] + ([label] if label else [])
+    return run_worker(py_cmd), run_worker(node_cmd)
+
+
+# ─── Comparaison ─────────────────────────────────────────────
+
+def match_key(row):
+    """Appariement indépendant du format d'identity_key (qui fait partie de ce qu'on compare)."""
+    if row.get("n_enreg"):
+        return ("N", row["n_enreg"])
+    return ("F", row.get("code"), row.get("dci"), row.get("nom_marque"), row.get("dosage"))
+
+
+def index_rows(rows):
+    """{clé: [lignes]} : les doublons de N° sont appariés dans l'ordre d'apparition."""
+    indexed = {}
+    for row in rows:
+        indexed.setdefault(match_key(row), []).append(row)
+    return indexed
+
+
+def compare_table(py_rows, ts_rows):
+    py_index, ts_index = index_rows(py_rows), index_rows(ts_rows)
+    report = {
+        "python_rows": len(py_rows), "node_rows": len(ts_rows),
+        "only_python": 0, "only_node": 0, "mismatched_rows": 0,
+        "fields": {}, "examples": [],
+    }
+    for key in py_index.keys() | ts_index.keys():
+        left, right = py_index.get(key, []), ts_index.get(key, [])
+        report["only_python"] += max(0, len(left) - len(right))
+        report["only_node"] += max(0, len(right) - len(left))
+        if len(left) != len(right) and len(report["examples"]) < MAX_EXAMPLES:
+            report["examples"].append({"key": list(key), "python": len(left), "node": len(right)})
+        for a, b in zip(left, right):
+            diffs = {f: [a.get(f), b.get(f)] for f in sorted(a.keys() | b.keys()) if a.get(f) != b.get(f)}
+            if not diffs:
+                continue
+            report["mismatched_rows"] += 1
+            for field in diffs:
+                report["fields"][field] = report["fields"].get(field, 0) + 1
+            if len(report["examples"]) < MAX_EXAMPLES:
+                report["examples"].append({"key": list(key), "diffs": diffs})
+    return report
+
+
+def diff_signatures(file_report):
+    """Types de différences ("retraits.date_init", "enregistrements.only_node"…) pour la référence."""
+    signatures = set()
+    for field in ("version_label", "reference_date"):
+        if file_report["meta"][field][0] != file_report["meta"][field][1]:
+            signatures.add(field)
+    for table, t in file_report["tables"].items():
+        signatures.update(f"{table}.{field}" for field in t["fields"])
+        if t["only_python"]:
+            signatures.add(f"{table}.only_python")
+        if t["only_node"]:
+            signatures.add(f"{table}.only_node")
+    return sorted(signatures)
+
+
+def compare_file(path: Path, label: str | None):
+    py, ts = run_parsers(path, label)
+    report = {
+        "meta": {field: [py[field], ts[field]] for field in ("version_label", "reference_date")},
+        "perf": {
+            "python": {"parse_ms": round(py["parse_ms"], 1), "peak_rss_mb": round(py["peak_rss_kb"] / 1024, 1)},
+            "node": {"parse_ms": round(ts["parse_ms"], 1), "peak_rss_mb": round(ts["peak_rss_kb"] / 1024, 1)},
+        },
+        "tables": {table: compare_table(py["tables"][table], ts["tables"][table]) for table in TABLES},
+    }
+    report["diffs"] = diff_signatures(report)
+    return report
+
+
+# ─── Corpus ──────────────────────────────────────────────────
+
+def build_edge_workbook(out: Path):
+    """Petit classeur synthétique dont quelques cellules reprennent des cas vus dans les exports MIPH."""
+    from openpyxl import load_workbook
+
+    build_workbook(out, rows=60, retraits=20, non_renouveles=20, seed=7)
+    wb = load_workbook(out)
+    ws = wb[wb.sheetnames[0]]
+    first = 4  # 2 lignes de titre + en-tête
+    # (ligne, index de colonne 0-based, valeur) ; date_init = col 14, date_final = col 15
+    edits = [
+        (0, 14, "03/07/2018"),
+        (1, 14, "2018-07-03"),
+        (2, 14, "03.07.2018"),
+        (3, 14, 43284),
+        (4, 14, "43284"),
+        (5, 15, datetime(2023, 7, 2, 23, 30)),
+        (6, 1, "  282/08  D 00000/09 "),
+        (7, 2, 4859),
+        (8, 3, None),          # DCI vide, N° présent
+        (9, 1, None),          # N° vide : clé F::…
+        (10, 4, "DOLIPRANE®   "),
+        (11, 14, "31/02/2019"),
+        (12, 15, "sans date"),
+    ]
+    for row, col, value in edits:
+        ws.cell(row=first + row, column=col + 1, value=value)
+    wb.save(out)
+    return out
+
+
+def build_corpus(tmp: Path, synthetic: list, seed: int):
+    corpus = [build_edge_workbook(tmp / "cas_limites_decembre_2025.xlsx")]
+    for rows in synthetic:
+        corpus.append(build_workbook(tmp / f"synthetic_{rows}_decembre_2025.xlsx", rows=rows, seed=seed))
+    return corpus
+
+
+# ─── Rapport ─────────────────────────────────────────────────
+
+def print_report(report):
+    for name, f in report["files"].items():
+        perf = f["perf"]
+        print(f"\n{name}")
+        print(f"  python  {perf['python']['parse_ms']:>9.1f} ms  {perf['python']['peak_rss_mb']:>7.1f} Mo")
+        print(f"  node    {perf['node']['parse_ms']:>9.1f} ms  {perf['node']['peak_rss_mb']:>7.1f} Mo")
+        for field, (a, b) in f["meta"].items():
+            if a != b:
+                print(f"  {field}: python={a!r} node={b!r}")
+        for table, t in f["tables"].items():
+            status = "identique" if not (t["only_python"] or t["only_node"] or t["mismatched_rows"]) else "DIFFÉRENT"
+            print(
+                f"  {table:<16} {t['python_rows']:>6} / {t['node_rows']:<6} {status}"
+                + (f"  (python seul: {t['only_python']}, node seul: {t['only_node']}, "
+                   f"lignes divergentes: {t['mismatched_rows']})" if status != "identique" else "")
+            )
+            for field, n in sorted(t["fields"].items(), key=lambda kv: -kv[1]):
+                print(f"      {field:<16} {n}")
+            for example in t["examples"]:
+                print(f"      ex. {json.dumps(example, ensure_ascii=False, default=str)}")
+    print()
+
+
+def check(report, baseline, args):
+    """Différences nouvelles (absentes de la référence) et régressions temps / mémoire."""
+    failures = []
+    base_files = (baseline or {}).get("files", {})
+    for name, f in report["files"].items():
+        base = base_files.get(name)
+        known = set(base["diffs"]) if base else set()
+        new = [d for d in f["diffs"] if d not in known]
+        if new:
+            failures.append(f"{name}: différences python/node sur {', '.join(new)}")
+        if not base:
+            continue
+        for impl in ("python", "node"):
+            now, before = f["perf"][impl], base["perf"][impl]
+            if now["parse_ms"] > before["parse_ms"] * (1 + args.max_regression) \
+                    and now["parse_ms"] - before["parse_ms"] > args.min_delta_ms:
+                failures.append(f"{name}: {impl} {before['parse_ms']} → {now['parse_ms']} ms")
+            if now["peak_rss_mb"] > before["peak_rss_mb"] * (1 + args.max_regression) \
+                    and now["peak_rss_mb"] - before["peak_rss_mb"] > args.min_delta_mb:
+                failures.append(f"{name}: {impl} {before['peak_rss_mb']} → {now['peak_rss_mb']} Mo")
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parité et vitesse : parseur Python vs lib/excel-parser.ts")
+    parser.add_argument("files", nargs="*", type=Path, help="Vrais classeurs MIPH à inclure")
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[6000], metavar="N",
+                        help="Tailles des classeurs synthétiques (défaut : 6000 ; vide = aucun)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine des classeurs synthétiques")
+    parser.add_argument("--baseline", type=Path, default=None, help="Référence JSON à comparer")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="Enregistrer ce passage comme référence")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Régression tolérée (0.25 = +25 %%)")
+    parser.add_argument("--min-delta-ms", type=float, default=200.0, help="Écart minimal (ms) pour une régression")
+    parser.add_argument("--min-delta-mb", type=float, default=20.0, help="Écart minimal (Mo) pour une régression")
+    parser.add_argument("--json", type=Path, default=None, help="Écrire le rapport complet en JSON")
+    parser.add_argument("--worker", type=Path, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--label", type=str, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.worker:
+        json.dump(python_worker(args.worker, args.label), sys.stdout, default=str)
+        sys.exit(0)
+
+    for path in args.files:
+        if not path.exists():
+            log(f"Fichier introuvable: {path}", "ERROR")
+            sys.exit(1)
+
+    report = {"files": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = build_corpus(Path(tmp), args.synthetic, args.seed) + list(args.files)
+        for path in corpus:
+            log(f"Parsing {path.name} (python + node)")
+            report["files"][path.name] = compare_file(path, None)
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+        log(f"Référence enregistrée : {args.save_baseline}", "OK")
+        sys.exit(0)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    failures = check(report, baseline, args)
+    for failure in failures:
+        log(failure, "ERROR")
+    if failures:
+        sys.exit(1)
+    log("Parité et performances conformes", "OK")
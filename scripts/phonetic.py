@@ -0,0 +1,119 @@
+"""
+Clés phonétiques (français) et clés de tokens pour la recherche tolérante.
+
+Les pharmaciens saisissent les noms de marque "à l'oreille" : AUGMENTIN /
+OGMENTIN, KLACID / CLACID, AMOXICILLINE / AMOXYCILINE. Chaque mot est réduit
+à un squelette sonore : graphies françaises ramenées à un son (PH→F, QU→K,
+C/G doux, EAU→O…), voyelles supprimées après la première lettre, lettres
+répétées fusionnées.
+
+  phonetic_key("Amoxicilline")  → "AMKSLN"
+  phonetic_key("AMOXYCILINE")   → "AMKSLN"
+
+La recherche peut alors trouver des candidats par égalité (btree) ou par
+recouvrement de tableau (GIN sur search_tokens) avant tout calcul trigramme.
+
+Règles identiques dans lib/phonetic.ts — toute modification doit être
+reportée des deux côtés (sinon les clés calculées à l'ingestion ne
+correspondent plus à celles de la requête).
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Ordre significatif : X est réécrit avant que CH/SH ne produisent des X
+RULES = (
+    (r"PH", "F"),
+    (r"TH", "T"),
+    (r"GH", "G"),
+    (r"X", "KS"),
+    (r"SCH", "X"),
+    (r"CH(?=[LR])", "K"),
+    (r"CH", "X"),
+    (r"SH", "X"),
+    (r"QU", "K"),
+    (r"Q", "K"),
+    (r"CK", "K"),
+    (r"C(?=[EIY])", "S"),
+    (r"C", "K"),
+    (r"GU(?=[EIY])", "G"),
+    (r"G(?=[EIY])", "J"),
+    (r"GN", "N"),
+    (r"W", "V"),
+    (r"Z", "S"),
+    (r"EAU", "O"),
+    (r"AU", "O"),
+    (r"OU", "U"),
+    (r"AI", "E"),
+    (r"EI", "E"),
+    (r"Y", "I"),
+    (r"H", ""),
+)
+COMPILED_RULES = tuple((re.compile(pattern), repl) for pattern, repl in RULES)
+# Un squelette de moins de 3 consonnes ne discrimine rien (para, pour, peros → ~PR)
+MIN_TOKEN_KEY = 3
+
+
+def fold(text):
+    """Minuscules ASCII, sans accents ni ®."""
+    nfkd = unicodedata.normalize("NFKD", str(text).lower().replace("®", " "))
+    return "".join(c for c in nfkd if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=None)
+def word_key(word):
+    """Squelette phonétique d'un mot (lettres a-z uniquement)."""
+    s = word.upper()
+    for pattern, repl in COMPILED_RULES:
+        s = pattern.sub(repl, s)
+    # E et S finaux muets
+    if len(s) > 2:
+        s = re.sub(r"[ES]$", "", s)
+    if not s:
+        return ""
+    code = s[0] + re.sub(r"[AEIOU]", "", s[1:])
+    return re.sub(r"(.)\1+", r"\1", code)
+
+
+@lru_cache(maxsize=None)
+def phonetic_key(text):
+    """Clé de la chaîne entière : squelettes des mots, séparés par un espace."""
+    if not text:
+        return None
+    keys = [word_key(w) for w in re.findall(r"[a-z]+", fold(text))]
+    return " ".join(k for k in keys if k) or None
+
+
+@lru_cache(maxsize=None)
+def text_tokens(text):
+    """Mots normalisés (≥ 2 caractères) et leurs squelettes préfixés par '~'."""
+    if not text:
+        return ()
+    tokens = set()
+    for word in re.findall(r"[a-z0-9]+", fold(text)):
+        if len(word) < 2:
+            continue
+        tokens.add(word)
+        if word.isalpha() and len(word) >= 3:
+            key = word_key(word)
+            if len(key) >= MIN_TOKEN_KEY:
+                tokens.add("~" + key)
+    return tuple(sorted(tokens))
+
+
+def search_keys(nom_marque, dci):
+    """(nom_marque_phon, dci_phon, search_tokens) pour une ligne."""
+    tokens = sorted(set(text_tokens(nom_marque)) | set(text_tokens(dci)))
+    return phonetic_key(nom_marque), phonetic_key(dci), tokens
+
+
+def add_search_keys(rows, marque_of, dci_of):
+    """
+    Calcule les clés d'un lot de lignes. Les valeurs répétées (une DCI
+    revient des dizaines de fois) ne sont calculées qu'une fois : passe sur les
+    valeurs uniques d'abord, puis simple recherche par ligne.
+    """
+    unique = {(marque_of(r), dci_of(r)) for r in rows}
+    keys = {pair: search_keys(*pair) for pair in unique}
+    return [keys[(marque_of(r), dci_of(r))] for r in rows]
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Pipeline de mise à jour complet, incrémental.
+
+Enchaîne en une commande ce qui se faisait à la main :
+  ingest_to_supabase.py  →  import_atc.py --atc … --match  →  --manual-mapping …
+
+Les étapes forment un graphe de dépendances :
+
+  nomenclature ──┐
+                 ├─→ atc_match ─→ manual_mapping
+  atc_codes ─────┘
+
+Chaque étape a une empreinte (hash des fichiers d'entrée, options, empreintes
+des dépendances ; libellé de version en base pour atc_match) mémorisée dans
+data/.pipeline_state.json. Une étape dont l'empreinte n'a pas changé — et dont
+aucune dépendance n'a été rejouée — est ignorée. Les étapes indépendantes
+(ex. import CSV ATC et parsing de la nomenclature) tournent en parallèle, sur
+un pool de connexions partagé.
+
+Usage:
+  DATABASE_URL=... python scripts/pipeline.py \\
+    --current data/nomenclature_decembre_2025.xlsx \\
+    --previous data/nomenclature_aout_2025.xlsx \\
+    --atc data/atc_codes.csv --match \\
+    --manual-mapping data/dci_sans_atc.txt
+
+  # Voir ce qui serait rejoué, sans rien exécuter
+  python scripts/pipeline.py --current ... --atc ... --match --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+import psycopg2
+from psycopg2 import errors
+from psycopg2.pool import ThreadedConnectionPool
+
+from import_atc import auto_match_dci, import_atc_codes, import_manual_mapping
+from export_snapshots import DEFAULT_SNAPSHOT_DIR
+from ingest_to_supabase import DEFAULT_DATA_DIR, DEFAULT_LINKAGE_REPORT, infer_version_from_filename, ingest, log
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+DEFAULT_STATE_FILE = DEFAULT_DATA_DIR / ".pipeline_state.json"
+
+RAN, SKIPPED, FAILED, BLOCKED, PLANNED = "exécutée", "inchangée", "échec", "bloquée", "à exécuter"
+
+
+@dataclass
+class Step:
+    name: str
+    run: Callable                      # run(conn)
+    inputs: dict                       # valeurs qui déterminent le résultat
+    deps: tuple = ()
+    check: Optional[Callable] = None   # check(conn) -> bool ; False = état en base à refaire
+    uses_db_version: bool = False      # le résultat dépend de la nomenclature en base
+    result: dict = field(default_factory=dict)
+
+
+def file_digest(path: Path | None):
+    if path is None:
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def current_db_version(conn):
+    """Dernier libellé de version présent en base (None si aucune)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT version_label FROM nomenclature_versions
+            ORDER BY reference_date DESC NULLS LAST, created_at DESC
+            LIMIT 1
+        """)
+        row = cur.fetchone()
+        conn.commit()
+        return row[0] if row else None
+    except errors.UndefinedTable:
+        conn.rollback()
+        return None
+    finally:
+        cur.close()
+
+
+def fingerprint(step: Step, dep_fingerprints: dict, db_version=None):
+    payload = {"inputs": step.inputs, "deps": dep_fingerprints}
+    if step.uses_db_version:
+        payload["db_version"] = db_version
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Pipeline:
+    def __init__(self, steps, pool, state_file: Path, force=(), dry_run=False, jobs=2):
+        names = {s.name for s in steps}
+        # Une dépendance absente du graphe (ex. pas de --atc) est simplement ignorée
+        for s in steps:
+            s.deps = tuple(d for d in s.deps if d in names)
+        self.steps = {s.name: s for s in steps}
+        self.pool = pool
+        self.state_file = state_file
+        self.state = json.loads(state_file.read_text()) if state_file.exists() else {}
+        self.force = set(force)
+        self.dry_run = dry_run
+        self.jobs = jobs
+        self.lock = threading.Lock()
+
+    def save_state(self):
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self.state_file.write_text(json.dumps(self.state, indent=2, ensure_ascii=False))
+
+    def execute(self, step: Step):
+        conn = self.pool.getconn()
+        try:
+            deps = {d: self.steps[d].result for d in step.deps}
+            # Lu après les dépendances : l'étape nomenclature a déjà posé son libellé
+            db_version = current_db_version(conn) if step.uses_db_version else None
+            fp = fingerprint(step, {d: r["fingerprint"] for d, r in deps.items()}, db_version)
+            previous = self.state.get(step.name, {})
+            reasons = []
+            if "all" in self.force or step.name in self.force:
+                reasons.append("forcée")
+            if previous.get("fingerprint") != fp:
+                reasons.append("entrées modifiées")
+            if any(r["status"] in (RAN, PLANNED) for r in deps.values()):
+                reasons.append("dépendance rejouée")
+            if not reasons and step.check and not step.check(conn):
+                reasons.append("état en base différent")
+
+            if not reasons:
+                log(f"[{step.name}] inchangée — ignorée")
+                return {"status": SKIPPED, "seconds": 0.0, "fingerprint": fp}
+            if self.dry_run:
+                log(f"[{step.name}] à exécuter ({', '.join(reasons)})")
+                return {"status": PLANNED, "seconds": 0.0, "fingerprint": fp}
+
+            log(f"[{step.name}] démarrage ({', '.join(reasons)})")
+            start = time.perf_counter()
+            step.run(conn)
+            conn.commit()
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.state[step.name] = {"fingerprint": fp, "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                self.save_state()
+            log(f"[{step.name}] terminée en {elapsed:.1f}s", "OK")
+            return {"status": RAN, "seconds": elapsed, "fingerprint": fp}
+        except Exception as exc:
+            conn.rollback()
+            log(f"[{step.name}] échec : {exc}", "ERROR")
+            return {"status": FAILED, "seconds": 0.0, "fingerprint": None}
+        finally:
+            self.pool.putconn(conn)
+
+    def run(self):
+        pending = dict(self.steps)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while pending or running:
+                for name, step in list(pending.items()):
+                    if any(d in pending or d in running.values() for d in step.deps):
+                        continue
+                    del pending[name]
+                    if any(self.steps[d].result["status"] in (FAILED, BLOCKED) for d in step.deps):
+                        step.result = {"status": BLOCKED, "seconds": 0.0, "fingerprint": None}
+                        continue
+                    running[executor.submit(self.execute, step)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.steps[running.pop(future)].result = future.result()
+        return self.steps
+
+    def summary(self, total: float):
+        width = max(len(n) for n in self.steps)
+        print(f"\n{'étape'.ljust(width)}  {'statut':<12}  durée")
+        for name, step in self.steps.items():
+            print(f"{name.ljust(width)}  {step.result['status']:<12}  {step.result['seconds']:.1f}s")
+        print(f"{'total (mur)'.ljust(width)}  {'':<12}  {total:.1f}s\n")
+
+
+def build_steps(args):
+    steps = []
+    if args.current:
+        steps.append(Step(
+            name="nomenclature",
+            run=lambda conn: ingest(
+                conn, args.current, args.previous, args.current_label, args.previous_label,
+                maintenance=not args.skip_maintenance, linkage_report=DEFAULT_LINKAGE_REPORT,
+                snapshot_dir=None if args.skip_snapshots else DEFAULT_SNAPSHOT_DIR,
+            ),
+            inputs={
+                "current": file_digest(args.current),
+                "previous": file_digest(args.previous),
+                "current_label": args.current_label,
+                "previous_label": args.previous_label,
+            },
+            # Une ingestion faite entre-temps (ex. interface admin) impose de rejouer
+            check=lambda conn: current_db_version(conn) == args.current_label,
+        ))
+    if args.atc:
+        steps.append(Step(
+            name="atc_codes",
+            run=lambda conn: import_atc_codes(str(args.atc), conn),
+            inputs={"atc": file_digest(args.atc)},
+        ))
+    if args.match:
+        steps.append(Step(
+            name="atc_match",
+            run=lambda conn: auto_match_dci(conn, report=args.report),
+            inputs={"report": args.report},
+            deps=("nomenclature", "atc_codes"),
+            # Sans --current, une ingestion faite ailleurs doit quand même relancer le matching
+            uses_db_version=True,
+        ))
+    if args.manual_mapping:
+        # Après l'auto-matching, qui réécrit code_atc même sur les lignes manuelles
+        steps.append(Step(
+            name="manual_mapping",
+            run=lambda conn: import_manual_mapping(str(args.manual_mapping), conn),
+            inputs={"mapping": file_digest(args.manual_mapping)},
+            deps=("atc_match", "atc_codes"),
+        ))
+    return steps
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pipeline incrémental : nomenclature + ATC + mapping manuel")
+    parser.add_argument("--current", type=Path, default=None, help="Fichier nomenclature courant (.xlsx)")
+    parser.add_argument("--previous", type=Path, default=None, help="Fichier nomenclature précédent (.xlsx)")
+    parser.add_argument("--current-label", type=str, default=None, help="Libellé version courante")
+    parser.add_argument("--previous-label", type=str, default=None, help="Libellé version précédente")
+    parser.add_argument("--skip-maintenance", action="store_true", help="Pas de maintenance post-ingestion")
+    parser.add_argument("--skip-snapshots", action="store_true", help="Pas d'export des snapshots JSON")
+    parser.add_argument("--atc", type=Path, default=None, help="CSV de la classification ATC")
+    parser.add_argument("--match", action="store_true", help="Auto-matching DCI → ATC")
+    parser.add_argument("--report", action="store_true", help="Exporter les DCIs sans correspondance")
+    parser.add_argument("--manual-mapping", type=Path, default=None, help="Fichier DCI;CODE_ATC")
+    parser.add_argument("--state", type=Path, default=DEFAULT_STATE_FILE, help="Fichier d'état des empreintes")
+    parser.add_argument("--force", nargs="*", default=[], metavar="ETAPE", help="Rejouer ces étapes (ou 'all')")
+    parser.add_argument("--jobs", type=int, default=2, help="Étapes exécutées en parallèle")
+    parser.add_argument("--dry-run", action="store_true", help="Afficher le plan sans rien exécuter")
+    args = parser.parse_args()
+
+    for path in (args.current, args.previous, args.atc, args.manual_mapping):
+        if path and not path.exists():
+            parser.error(f"Fichier introuvable: {path}")
+    if args.current and args.current_label is None:
+        args.current_label = infer_version_from_filename(args.current)
+    if args.previous and args.previous_label is None:
+        args.previous_label = infer_version_from_filename(args.previous)
+    return args
+
+
+if __name__ == "__main__":
+    if not DATABASE_URL:
+        log("DATABASE_URL manquante", "ERROR")
+        sys.exit(1)
+
+    args = parse_args()
+    steps = build_steps(args)
+    if not steps:
+        log("Aucune étape demandée (--current, --atc, --match, --manual-mapping)", "WARN")
+        sys.exit(1)
+
+    pool = ThreadedConnectionPool(1, max(1, args.jobs), DATABASE_URL)
+    started = time.perf_counter()
+    try:
+        pipeline = Pipeline(steps, pool, args.state, args.force, args.dry_run, args.jobs)
+        pipeline.run()
+    finally:
+        pool.closeall()
+    pipeline.summary(time.perf_counter() - started)
+
+    if any(s.result["status"] in (FAILED, BLOCKED) for s in pipeline.steps.values()):
+        sys.exit(1)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Maintenance post-ingestion : ANALYZE, santé des index et pré-chauffage.
+
+Après un TRUNCATE + rechargement, le planificateur travaille sur des
+statistiques périmées jusqu'au passage de l'autovacuum, et les index
+trigramme GIN sont froids (et leur pending list pleine). Cette étape :
+  1. ANALYZE des tables rechargées ;
+  2. vide la pending list des index GIN (gin_clean_pending_list) ;
+  3. mesure la densité des index B-tree (pgstattuple) et les reconstruit
+     avec REINDEX CONCURRENTLY sous le seuil ;
+  4. charge tables et index trigramme en shared buffers (pg_prewarm).
+
+Appelée automatiquement en fin de scripts/ingest_to_supabase.py, elle peut
+aussi être lancée seule :
+
+Usage:
+  DATABASE_URL=... python scripts/post_ingest_maintenance.py
+  DATABASE_URL=... python scripts/post_ingest_maintenance.py --no-reindex --tables enregistrements
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+INGESTED_TABLES = ("enregistrements", "retraits", "non_renouveles", "nomenclature_versions")
+
+# Densité moyenne des feuilles B-tree (%) sous laquelle on reconstruit l'index.
+# Un index fraîchement construit est à ~90 % (fillfactor par défaut).
+DEFAULT_MIN_LEAF_DENSITY = 60.0
+# En dessous, la densité mesurée n'est pas significative.
+MIN_LEAF_PAGES = 10
+
+
+def log(msg, level="INFO"):
+    colors = {"INFO": "\033[94m", "OK": "\033[92m", "WARN": "\033[93m", "ERROR": "\033[91m"}
+    print(f"{colors.get(level, '')}[{level}] {msg}\033[0m")
+
+
+def has_extension(cur, name: str):
+    cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = %s)", (name,))
+    return cur.fetchone()[0]
+
+
+def list_indexes(cur, tables):
+    """(nom d'index, table, méthode d'accès) des index des tables données."""
+    cur.execute(
+        """
+        SELECT i.relname, t.relname, am.amname
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_am am ON am.oid = i.relam
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = current_schema()
+          AND t.relname = ANY(%s)
+          AND x.indisvalid
+        ORDER BY t.relname, i.relname
+        """,
+        (list(tables),),
+    )
+    return cur.fetchall()
+
+
+def analyze_tables(cur, tables, indexes):
+    for table in tables:
+        cur.execute(f'ANALYZE "{table}"')
+    return f"{len(tables)} table(s)"
+
+
+def flush_gin_pending(cur, tables, indexes):
+    gin = [name for name, _, am in indexes if am == "gin"]
+    flushed = 0
+    for name in gin:
+        cur.execute("SELECT gin_clean_pending_list(%s::regclass)", (name,))
+        flushed += cur.fetchone()[0] or 0
+    return f"{len(gin)} index GIN, {flushed} page(s) intégrée(s)"
+
+
+def reindex_bloated(cur, tables, indexes, min_leaf_density=DEFAULT_MIN_LEAF_DENSITY):
+    if not has_extension(cur, "pgstattuple"):
+        log("pgstattuple absent : contrôle de densité ignoré (CREATE EXTENSION pgstattuple)", "WARN")
+        return "ignoré"
+    cur.execute("SHOW server_version_num")
+    concurrently = int(cur.fetchone()[0]) >= 120000
+
+    rebuilt = []
+    for name, table, am in indexes:
+        if am != "btree":
+            continue
+        cur.execute("SELECT avg_leaf_density, leaf_pages FROM pgstatindex(%s::regclass)", (name,))
+        density, leaf_pages = cur.fetchone()
+        if leaf_pages < MIN_LEAF_PAGES or density >= min_leaf_density:
+            continue
+        log(f"{name} ({table}) : densité {density:.0f} % < {min_leaf_density:.0f} % → REINDEX", "WARN")
+        if concurrently:
+            cur.execute(f'REINDEX INDEX CONCURRENTLY "{name}"')
+        else:
+            cur.execute(f'REINDEX INDEX "{name}"')
+        rebuilt.append(name)
+    return f"{len(rebuilt)} index reconstruit(s)"
+
+
+def prewarm(cur, tables, indexes):
+    gin = [name for name, _, am in indexes if am == "gin"]
+    if has_extension(cur, "pg_prewarm"):
+        pages = 0
+        for rel in (*tables, *gin):
+            cur.execute("SELECT pg_prewarm(%s::regclass)", (rel,))
+            pages += cur.fetchone()[0]
+        return f"{pages} page(s) chargée(s)"
+
+    # Repli sans pg_prewarm : un parcours complet ramène au moins les tables
+    # en cache (les index GIN resteront froids).
+    log("pg_prewarm absent : pré-chauffage des tables seulement (CREATE EXTENSION pg_prewarm)", "WARN")
+    for table in tables:
+        cur.execute(f'SELECT COUNT(*) FROM "{table}"')
+        cur.fetchone()
+    return f"{len(tables)} table(s) parcourue(s)"
+
+
+def run_maintenance(conn, tables=INGESTED_TABLES, reindex=True, warm=True, min_leaf_density=DEFAULT_MIN_LEAF_DENSITY):
+    """
+    Exécute les étapes de maintenance et retourne [(étape, durée_s, détail)].
+    Une étape en erreur est signalée (WARN) et les suivantes sont exécutées.
+    La connexion passe temporairement en autocommit (REINDEX CONCURRENTLY
+    ne peut pas tourner dans une transaction).
+    """
+    steps = [("ANALYZE", analyze_tables), ("GIN pending list", flush_gin_pending)]
+    if reindex:
+        steps.append(("Densité / REINDEX", lambda c, t, i: reindex_bloated(c, t, i, min_leaf_density)))
+    if warm:
+        steps.append(("Pré-chauffage", prewarm))
+
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    report = []
+    try:
+        cur = conn.cursor()
+        indexes = list_indexes(cur, tables)
+        for label, step in steps:
+            start = time.perf_counter()
+            # Les données sont déjà publiées : une étape refusée (droits insuffisants
+            # sur une base managée, REINDEX en échec…) ne doit pas faire échouer l'ingestion
+            try:
+                detail = step(cur, tables, indexes)
+                level = "OK"
+            except psycopg2.Error as exc:
+                if conn.closed:
+                    raise
+                detail = f"échec : {str(exc).strip().splitlines()[0]}"
+                level = "WARN"
+            elapsed = time.perf_counter() - start
+            report.append((label, elapsed, detail))
+            log(f"Maintenance — {label} : {elapsed:.2f}s ({detail})", level)
+        cur.close()
+    finally:
+        conn.autocommit = previous_autocommit
+    log(f"Maintenance totale : {sum(r[1] for r in report):.2f}s", "OK")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Maintenance post-ingestion (ANALYZE, index, pré-chauffage)")
+    parser.add_argument("--tables", nargs="+", default=list(INGESTED_TABLES), help="Tables à traiter")
+    parser.add_argument("--no-reindex", action="store_true", help="Ne pas reconstruire les index peu denses")
+    parser.add_argument("--no-prewarm", action="store_true", help="Ne pas pré-chauffer les shared buffers")
+    parser.add_argument(
+        "--min-leaf-density", type=float, default=DEFAULT_MIN_LEAF_DENSITY,
+        help="Densité B-tree (%%) sous laquelle un index est reconstruit",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    if not DATABASE_URL:
+        log("DATABASE_URL manquante", "ERROR")
+        sys.exit(1)
+
+    args = parse_args()
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        run_maintenance(conn, args.tables, not args.no_reindex, not args.no_prewarm, args.min_leaf_density)
+    finally:
+        conn.close()
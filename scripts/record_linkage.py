@@ -0,0 +1,174 @@
+"""
+Rapprochement des enregistrements entre deux versions de la nomenclature.
+
+identity_key() retombe sur F::code::dci::nom_marque::dosage quand n_enreg est
+absent : la moindre retouche cosmétique (ou une renumérotation MIPH) fait
+apparaître le produit comme "nouveau". Ce module rapproche les lignes restées
+sans correspondance exacte :
+
+  1. blocage : seules les lignes de même DCI, forme et dosage normalisés
+     sont comparées (coût quasi linéaire au lieu de O(n²)). Le dosage fait
+     partie de l'identité, comme dans identity_key() : 500MG et 250MG du
+     même produit sont deux enregistrements distincts ;
+  2. score de similarité pondéré dans chaque bloc ;
+  3. lien retenu si le meilleur candidat est réciproque, au-dessus du seuil
+     de confiance et nettement devant le suivant ; sinon, s'il reste
+     plausible, la paire part dans le rapport des cas ambigus.
+"""
+
+import csv
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+from pathlib import Path
+
+# Poids des champs dans le score (somme = 1). Pas de dosage : il fait partie de
+# la clé de blocage et vaudrait toujours 1 dans un bloc.
+FIELD_WEIGHTS = {
+    "nom_marque": 0.5625,
+    "labo": 0.1875,
+    "conditionnement": 0.125,
+    "code": 0.125,
+}
+CONFIDENT_SCORE = 0.85
+AMBIGUOUS_SCORE = 0.60
+MIN_MARGIN = 0.05
+# Au-delà, un bloc est redécoupé par début de nom de marque
+MAX_BLOCK_PAIRS = 250_000
+
+
+@lru_cache(maxsize=None)
+def normalize(text):
+    """Minuscules, sans accents ni ®, ponctuation et espaces compactés."""
+    if not text:
+        return ""
+    nfkd = unicodedata.normalize("NFKD", str(text).lower().replace("®", " "))
+    ascii_str = "".join(c for c in nfkd if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9/.,%]+", " ", ascii_str).strip()
+
+
+def dosage_key(dosage):
+    """Dosage comparable : "500 mg", "500MG" → "500mg" ; "0,5 g" → "0.5g"."""
+    return re.sub(r"\s+", "", normalize(dosage)).replace(",", ".")
+
+
+def blocking_key(row: dict):
+    return normalize(row.get("dci")), normalize(row.get("forme")), dosage_key(row.get("dosage"))
+
+
+def field_similarity(a, b):
+    a, b = normalize(a), normalize(b)
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def record_similarity(a: dict, b: dict):
+    return sum(w * field_similarity(a.get(f), b.get(f)) for f, w in FIELD_WEIGHTS.items())
+
+
+def split_block(current: list, previous: list):
+    """Redécoupe un bloc trop gros sur les 2 premiers caractères du nom de marque."""
+    if len(current) * len(previous) <= MAX_BLOCK_PAIRS:
+        return [(current, previous)]
+    sub = {}
+    for side, rows in ((0, current), (1, previous)):
+        for item in rows:
+            prefix = normalize(item[1].get("nom_marque"))[:2]
+            sub.setdefault(prefix, ([], []))[side].append(item)
+    return list(sub.values())
+
+
+def link_block(current: list, previous: list, confident: float, ambiguous: float, margin: float):
+    """
+    current / previous : [(index, row)]. Retourne (liens, ambigus) où
+    liens = [(idx_courant, idx_précédent, score)] et
+    ambigus = [(idx_courant, [(idx_précédent, score), ...])].
+    """
+    scores = {}
+    for ci, crow in current:
+        for pi, prow in previous:
+            s = record_similarity(crow, prow)
+            if s >= ambiguous:
+                scores[(ci, pi)] = s
+
+    by_current, by_previous = {}, {}
+    for (ci, pi), s in scores.items():
+        by_current.setdefault(ci, []).append((s, pi))
+        by_previous.setdefault(pi, []).append((s, ci))
+    for candidates in (*by_current.values(), *by_previous.values()):
+        candidates.sort(reverse=True)
+
+    links, unsure = [], []
+    for ci, candidates in by_current.items():
+        best, pi = candidates[0]
+        runner_up = candidates[1][0] if len(candidates) > 1 else 0.0
+        reverse = by_previous[pi]
+        reverse_runner_up = reverse[1][0] if len(reverse) > 1 else 0.0
+        mutual = reverse[0][1] == ci
+        if best >= confident and mutual and best - runner_up >= margin and best - reverse_runner_up >= margin:
+            links.append((ci, pi, best))
+        else:
+            unsure.append((ci, [(p, round(s, 3)) for s, p in candidates[:3]]))
+    return links, unsure
+
+
+def link_records(current_rows: list, previous_rows: list, key_fn,
+                 confident=CONFIDENT_SCORE, ambiguous=AMBIGUOUS_SCORE, margin=MIN_MARGIN):
+    """
+    Rapproche les lignes sans correspondance exacte de clé d'identité.
+
+    Retourne (liens, ambigus) :
+      liens   = {index courant: (index précédent, score)}
+      ambigus = [(index courant, [(index précédent, score), ...])]
+    """
+    current_keys = {key_fn(r) for r in current_rows}
+    previous_keys = {key_fn(r) for r in previous_rows}
+
+    blocks = {}
+    for i, r in enumerate(current_rows):
+        if key_fn(r) not in previous_keys:
+            blocks.setdefault(blocking_key(r), ([], []))[0].append((i, r))
+    for j, r in enumerate(previous_rows):
+        if key_fn(r) not in current_keys:
+            blocks.setdefault(blocking_key(r), ([], []))[1].append((j, r))
+
+    links, unsure = {}, []
+    for cur_block, prev_block in blocks.values():
+        if not cur_block or not prev_block:
+            continue
+        for cur_part, prev_part in split_block(cur_block, prev_block):
+            block_links, block_unsure = link_block(cur_part, prev_part, confident, ambiguous, margin)
+            links.update({ci: (pi, s) for ci, pi, s in block_links})
+            unsure.extend(block_unsure)
+    return links, unsure
+
+
+def write_linkage_report(path: Path, current_rows: list, previous_rows: list, links: dict, unsure: list):
+    """Rapport CSV : liens retenus puis cas ambigus à vérifier manuellement."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow([
+            "statut", "score", "n_enreg", "nom_marque", "dci", "forme", "dosage",
+            "n_enreg_precedent", "nom_marque_precedent", "dosage_precedent",
+        ])
+        for ci, (pi, score) in sorted(links.items()):
+            c, p = current_rows[ci], previous_rows[pi]
+            writer.writerow([
+                "lie", f"{score:.3f}", c["n_enreg"], c["nom_marque"], c["dci"], c["forme"], c["dosage"],
+                p["n_enreg"], p["nom_marque"], p["dosage"],
+            ])
+        for ci, candidates in unsure:
+            c = current_rows[ci]
+            for pi, score in candidates:
+                p = previous_rows[pi]
+                writer.writerow([
+                    "ambigu", f"{score:.3f}", c["n_enreg"], c["nom_marque"], c["dci"], c["forme"], c["dosage"],
+                    p["n_enreg"], p["nom_marque"], p["dosage"],
+                ])
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Génère un classeur nomenclature MIPH synthétique (3 feuilles) pour les tests
+de performance et de parité, sans dépendre d'un vrai export.
+
+La disposition des colonnes reproduit celle attendue par
+scripts/ingest_to_supabase.py et lib/excel-parser.ts (lignes de titre, puis
+ligne d'en-tête contenant "ENREGISTREMENT").
+
+Usage:
+  python scripts/synthetic_nomenclature.py --out data/synthetic_decembre_2025.xlsx --rows 6000
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from openpyxl import Workbook
+
+DCIS = [
+    "PARACETAMOL", "AMOXICILLINE", "IBUPROFENE", "METFORMINE", "OMEPRAZOLE",
+    "CETIRIZINE DICHLORHYDRATE", "AZITHROMYCINE", "AMLODIPINE", "ATORVASTATINE",
+    "KETOPROFENE", "METRONIDAZOLE", "DICLOFENAC SODIQUE", "CIPROFLOXACINE",
+    "LEVOTHYROXINE SODIQUE", "SALBUTAMOL", "PREDNISOLONE", "CEFTRIAXONE",
+    "ESOMEPRAZOLE", "LOSARTAN POTASSIQUE", "INSULINE GLARGINE", "TRAMADOL CHLORHYDRATE",
+    "AMOXICILLINE/ACIDE CLAVULANIQUE", "BISOPROLOL FUMARATE", "CLOPIDOGREL",
+    "FLUCONAZOLE", "GLICLAZIDE", "PHLOROGLUCINOL", "DOMPERIDONE", "LORATADINE",
+    "ACIDE ACETYLSALICYLIQUE",
+]
+FORMES = [
+    "COMPRIME", "COMPRIME PELLICULE", "GELULE", "SIROP", "SOLUTION INJECTABLE",
+    "POUDRE POUR SUSPENSION BUVABLE", "SUPPOSITOIRE", "CREME", "COLLYRE",
+]
+DOSAGES = ["5MG", "10MG", "20MG", "50MG", "100MG", "250MG", "500MG", "1G", "2G", "125MG/5ML"]
+CONDITIONNEMENTS = ["B/10", "B/20", "B/30", "FL/100ML", "B/1 FL", "B/12", "T/30G"]
+LISTES = ["Liste I", "Liste II", "Liste I HOP", None]
+LABOS = [
+    "SAIDAL", "BIOPHARM", "SANOFI WINTHROP", "HIKMA PHARMA", "EL KENDI",
+    "PFIZER", "NOVARTIS PHARMA", "MERINAL", "PHARMALLIANCE", "FRATER RAZES",
+]
+PAYS = ["ALGERIE", "FRANCE", "JORDANIE", "SUISSE", "INDE", "TUNISIE", "ALLEMAGNE"]
+MOTIFS = [
+    "Retrait par le détenteur pour motif commercial",
+    "Retrait pour non-conformité qualité",
+    "Retrait suite à une décision de pharmacovigilance",
+    None,
+]
+SYLLABES = ["DO", "LI", "PRA", "NEX", "TA", "ZOL", "VIR", "FEN", "KA", "MOL", "RI", "SAN", "TOR", "CLA", "FLO", "GYL"]
+
+TITLE_ROWS = [
+    ["MINISTERE DE L'INDUSTRIE PHARMACEUTIQUE"],
+    ["NOMENCLATURE NATIONALE DES PRODUITS PHARMACEUTIQUES A USAGE DE LA MEDECINE HUMAINE"],
+]
+ENREG_HEADER = [
+    "N°", "N°ENREGISTREMENT", "CODE", "DENOMINATION COMMUNE INTERNATIONALE", "NOM DE MARQUE",
+    "FORME", "DOSAGE", "CONDITIONNEMENT", "LISTE", "P1", "P2", "OBS", "LABORATOIRES DETENTEUR",
+    "PAYS DU LABORATOIRE", "DATE D'ENREGISTREMENT INITIAL", "DATE D'ENREGISTREMENT FINAL",
+    "TYPE", "STATUT", "DUREE DE STABILITE",
+]
+NON_RENOUV_HEADER = [
+    "N°", "N°ENREGISTREMENT", "CODE", "DENOMINATION COMMUNE INTERNATIONALE", "NOM DE MARQUE",
+    "FORME", "DOSAGE", "CONDITIONNEMENT", "LISTE", "P1", "P2", "LABORATOIRES DETENTEUR",
+    "PAYS DU LABORATOIRE", "DATE D'ENREGISTREMENT INITIAL", "DATE D'ENREGISTREMENT FINAL",
+    "TYPE", "STATUT",
+]
+RETRAIT_HEADER = [
+    "N°", "N°ENREGISTREMENT", "CODE", "DENOMINATION COMMUNE INTERNATIONALE", "NOM DE MARQUE",
+    "FORME", "DOSAGE", "CONDITIONNEMENT", "LISTE", "P1", "P2", "LABORATOIRES DETENTEUR",
+    "PAYS DU LABORATOIRE", "DATE D'ENREGISTREMENT INITIAL", "TYPE", "STATUT",
+    "DATE DE RETRAIT", "MOTIF DE RETRAIT",
+]
+
+
+def brand_name(rng: random.Random):
+    return "".join(rng.choice(SYLLABES) for _ in range(rng.randint(2, 3)))
+
+
+def random_date(rng: random.Random, start_year=2005, end_year=2025):
+    start = datetime(start_year, 1, 1)
+    return start + timedelta(days=rng.randint(0, (end_year - start_year) * 365))
+
+
+def base_product(rng: random.Random, i: int):
+    dci = rng.choice(DCIS)
+    code = f"{rng.randint(1, 20):02d}{rng.choice('ABCDEFGH')}{rng.randint(100, 999)}"
+    return {
+        "n_enreg": f"{rng.randint(1, 600):03d}/{rng.randint(1, 30):02d} {rng.choice('ABCDEFGH')} {i:05d}/{rng.randint(5, 25):02d}",
+        "code": code,
+        "dci": dci,
+        "nom_marque": f"{brand_name(rng)}®",
+        "forme": rng.choice(FORMES),
+        "dosage": rng.choice(DOSAGES),
+        "conditionnement": rng.choice(CONDITIONNEMENTS),
+        "liste": rng.choice(LISTES),
+        "labo": rng.choice(LABOS),
+        "pays": rng.choice(PAYS),
+        "date_init": random_date(rng),
+        "type_prod": rng.choice(["GE", "RE", "BIO"]),
+        "statut": rng.choice(["F", "I"]),
+    }
+
+
+def write_sheet(wb: Workbook, title: str, header: list, rows: list):
+    ws = wb.create_sheet(title)
+    for row in TITLE_ROWS:
+        ws.append(row)
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+
+
+def build_workbook(out: Path, rows: int = 6000, retraits: int = 400, non_renouveles: int = 600, seed: int = 42):
+    """Écrit un classeur synthétique et retourne le chemin produit."""
+    rng = random.Random(seed)
+    wb = Workbook()
+    wb.remove(wb.active)
+
+    enreg_rows = []
+    for i in range(rows):
+        p = base_product(rng, i)
+        date_final = p["date_init"] + timedelta(days=5 * 365)
+        enreg_rows.append([
+            i + 1, p["n_enreg"], p["code"], p["dci"], p["nom_marque"], p["forme"], p["dosage"],
+            p["conditionnement"], p["liste"], rng.choice(["R", "PRESCRIPTION HOSPITALIERE", None]), None,
+            rng.choice([None, "HOP"]), p["labo"], p["pays"], p["date_init"], date_final,
+            p["type_prod"], p["statut"], rng.choice(["24 MOIS", "36 MOIS", None]),
+        ])
+    write_sheet(wb, "Nomenclature Decembre 2025", ENREG_HEADER, enreg_rows)
+
+    nr_rows = []
+    for i in range(non_renouveles):
+        p = base_product(rng, rows + i)
+        nr_rows.append([
+            i + 1, p["n_enreg"], p["code"], p["dci"], p["nom_marque"], p["forme"], p["dosage"],
+            p["conditionnement"], p["liste"], "R", None, p["labo"], p["pays"],
+            p["date_init"], p["date_init"] + timedelta(days=5 * 365), p["type_prod"], p["statut"],
+        ])
+    write_sheet(wb, "Non Renouvelés", NON_RENOUV_HEADER, nr_rows)
+
+    retrait_rows = []
+    for i in range(retraits):
+        p = base_product(rng, rows + non_renouveles + i)
+        retrait_rows.append([
+            i + 1, p["n_enreg"], p["code"], p["dci"], p["nom_marque"], p["forme"], p["dosage"],
+            p["conditionnement"], p["liste"], "R", None, p["labo"], p["pays"],
+            p["date_init"], p["type_prod"], p["statut"], random_date(rng, 2015, 2025), rng.choice(MOTIFS),
+        ])
+    write_sheet(wb, "Retraits", RETRAIT_HEADER, retrait_rows)
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(out)
+    return out
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Génère une nomenclature MIPH synthétique (.xlsx)")
+    parser.add_argument("--out", type=Path, required=True, help="Fichier .xlsx à produire")
+    parser.add_argument("--rows", type=int, default=6000, help="Nombre d'enregistrements")
+    parser.add_argument("--retraits", type=int, default=400, help="Nombre de retraits")
+    parser.add_argument("--non-renouveles", type=int, default=600, help="Nombre de non renouvelés")
+    parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire (résultat reproductible)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    path = build_workbook(args.out, args.rows, args.retraits, args.non_renouveles, args.seed)
+    print(f"[OK] Classeur synthétique écrit : {path}")
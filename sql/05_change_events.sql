@@ -0,0 +1,39 @@
+-- ============================================================
+-- PharmaVeille DZ — Flux de changements (append-only)
+-- Alimenté par scripts/ingest_to_supabase.py à chaque ingestion.
+-- Les consommateurs (cron hebdo, /alertes, publications sociales)
+-- lisent uniquement ce qui est nouveau :
+--   SELECT * FROM nomenclature_changes WHERE seq > $last_seen ORDER BY seq
+-- Idempotent : exécuté aussi automatiquement par l'ingestion.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS nomenclature_changes (
+  seq             BIGSERIAL PRIMARY KEY,         -- curseur des consommateurs (strictement croissant)
+  event_type      VARCHAR(20) NOT NULL,          -- 'nouveau', 'retrait', 'non_renouvele', 'modification'
+  dedup_key       TEXT NOT NULL UNIQUE,          -- une ré-ingestion ne recrée pas l'évènement
+  identity_key    TEXT NOT NULL,                 -- même clé que identity_key() / identityKey()
+  version_label   VARCHAR(40),
+  n_enreg         TEXT,
+  dci             TEXT,
+  nom_marque      TEXT,
+  dosage          TEXT,
+  labo            TEXT,
+  motif_retrait   TEXT,
+  event_date      DATE,                          -- date_init / date_retrait / date_final selon le type
+  payload         JSONB,                         -- ex: champs modifiés {champ: [avant, après]}
+  created_at      TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_changes_type_seq ON nomenclature_changes(event_type, seq);
+
+-- Position de lecture de chaque consommateur
+CREATE TABLE IF NOT EXISTS change_feed_cursors (
+  consumer        VARCHAR(40) PRIMARY KEY,       -- ex: 'cron_weekly', 'facebook', 'newsletter'
+  last_seq        BIGINT NOT NULL DEFAULT 0,
+  updated_at      TIMESTAMPTZ DEFAULT NOW()
+);
+
+COMMENT ON TABLE nomenclature_changes IS
+  'Flux append-only des changements détectés à l''ingestion (nouveautés, retraits, non-renouvellements, modifications)';
+COMMENT ON COLUMN nomenclature_changes.dedup_key IS
+  'type::identity_key::discriminant (version ou date) — garantit l''absence de doublon lors d''une ré-ingestion';
@@ -0,0 +1,104 @@
+-- ============================================================
+-- PharmaVeille DZ — Staging de l'ingestion reprenable
+-- Utilisé par scripts/ingest_to_supabase.py --resumable :
+--   1. les lignes sont chargées par lots dans staging_*, chaque lot
+--      confirmé dans ingest_run_chunks (même transaction) ;
+--   2. une coupure réseau ne fait perdre que le lot en cours ;
+--   3. la publication (TRUNCATE + INSERT … SELECT depuis staging)
+--      se fait en une seule transaction.
+-- Idempotent : exécuté aussi automatiquement par l'ingestion.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS ingest_runs (
+  run_id          VARCHAR(40) PRIMARY KEY,       -- hash fichiers + libellés, ou --run-id
+  version_label   VARCHAR(40),
+  status          VARCHAR(12) NOT NULL DEFAULT 'loading',  -- 'loading', 'published'
+  chunk_size      INTEGER,                       -- figé à la création : les lots repris doivent coïncider
+  created_at      TIMESTAMPTZ DEFAULT NOW(),
+  published_at    TIMESTAMPTZ
+);
+
+ALTER TABLE ingest_runs ADD COLUMN IF NOT EXISTS chunk_size INTEGER;
+
+-- Un lot n'existe ici que si ses lignes staging ont été validées
+CREATE TABLE IF NOT EXISTS ingest_run_chunks (
+  run_id          VARCHAR(40) NOT NULL REFERENCES ingest_runs(run_id) ON DELETE CASCADE,
+  table_name      VARCHAR(40) NOT NULL,
+  chunk_no        INTEGER NOT NULL,
+  row_count       INTEGER NOT NULL,
+  loaded_at       TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (run_id, table_name, chunk_no)
+);
+
+-- Colonnes en TEXT : les contraintes de longueur s'appliquent à la publication
+CREATE TABLE IF NOT EXISTS staging_enregistrements (
+  run_id          VARCHAR(40) NOT NULL REFERENCES ingest_runs(run_id) ON DELETE CASCADE,
+  row_no          INTEGER NOT NULL,              -- ordre d'origine dans le fichier
+  n_enreg         TEXT,
+  code            TEXT,
+  dci             TEXT,
+  nom_marque      TEXT,
+  forme           TEXT,
+  dosage          TEXT,
+  conditionnement TEXT,
+  liste           TEXT,
+  prescription    TEXT,
+  obs             TEXT,
+  labo            TEXT,
+  pays            TEXT,
+  date_init       DATE,
+  date_final      DATE,
+  type_prod       TEXT,
+  statut          TEXT,
+  stabilite       TEXT,
+  annee           SMALLINT,
+  source_version  TEXT,
+  is_new_vs_previous BOOLEAN,
+  PRIMARY KEY (run_id, row_no)
+);
+
+CREATE TABLE IF NOT EXISTS staging_retraits (
+  run_id          VARCHAR(40) NOT NULL REFERENCES ingest_runs(run_id) ON DELETE CASCADE,
+  row_no          INTEGER NOT NULL,
+  n_enreg         TEXT,
+  code            TEXT,
+  dci             TEXT,
+  nom_marque      TEXT,
+  forme           TEXT,
+  dosage          TEXT,
+  conditionnement TEXT,
+  liste           TEXT,
+  prescription    TEXT,
+  labo            TEXT,
+  pays            TEXT,
+  date_init       DATE,
+  type_prod       TEXT,
+  statut          TEXT,
+  date_retrait    DATE,
+  motif_retrait   TEXT,
+  PRIMARY KEY (run_id, row_no)
+);
+
+CREATE TABLE IF NOT EXISTS staging_non_renouveles (
+  run_id          VARCHAR(40) NOT NULL REFERENCES ingest_runs(run_id) ON DELETE CASCADE,
+  row_no          INTEGER NOT NULL,
+  n_enreg         TEXT,
+  code            TEXT,
+  dci             TEXT,
+  nom_marque      TEXT,
+  forme           TEXT,
+  dosage          TEXT,
+  conditionnement TEXT,
+  liste           TEXT,
+  prescription    TEXT,
+  labo            TEXT,
+  pays            TEXT,
+  date_init       DATE,
+  date_final      DATE,
+  type_prod       TEXT,
+  statut          TEXT,
+  PRIMARY KEY (run_id, row_no)
+);
+
+COMMENT ON TABLE ingest_runs IS
+  'Runs d''ingestion --resumable ; les runs restés en ''loading'' plus de 7 jours sont purgés à la publication suivante';
@@ -0,0 +1,198 @@
+-- ============================================================
+-- PharmaVeille DZ — Clés phonétiques et tokens pour la recherche
+-- Colonnes calculées à l'ingestion (scripts/phonetic.py, porté dans
+-- lib/phonetic.ts pour la requête) :
+--   nom_marque_phon / dci_phon : squelette phonétique de la chaîne entière
+--   search_tokens              : mots normalisés + squelettes '~XXX' par mot
+-- Les candidats tolérants aux fautes sont trouvés par égalité (btree) ou
+-- recouvrement de tableau (GIN), le score trigramme ne porte que sur eux.
+-- Idempotent : exécuté aussi automatiquement par l'ingestion.
+-- ============================================================
+
+ALTER TABLE enregistrements
+  ADD COLUMN IF NOT EXISTS nom_marque_phon TEXT,
+  ADD COLUMN IF NOT EXISTS dci_phon        TEXT,
+  ADD COLUMN IF NOT EXISTS search_tokens   TEXT[];
+
+ALTER TABLE retraits
+  ADD COLUMN IF NOT EXISTS nom_marque_phon TEXT,
+  ADD COLUMN IF NOT EXISTS dci_phon        TEXT,
+  ADD COLUMN IF NOT EXISTS search_tokens   TEXT[];
+
+ALTER TABLE non_renouveles
+  ADD COLUMN IF NOT EXISTS nom_marque_phon TEXT,
+  ADD COLUMN IF NOT EXISTS dci_phon        TEXT,
+  ADD COLUMN IF NOT EXISTS search_tokens   TEXT[];
+
+-- Tables de l'ingestion --resumable (sql/06_ingest_staging.sql)
+ALTER TABLE IF EXISTS staging_enregistrements
+  ADD COLUMN IF NOT EXISTS nom_marque_phon TEXT,
+  ADD COLUMN IF NOT EXISTS dci_phon        TEXT,
+  ADD COLUMN IF NOT EXISTS search_tokens   TEXT[];
+
+ALTER TABLE IF EXISTS staging_retraits
+  ADD COLUMN IF NOT EXISTS nom_marque_phon TEXT,
+  ADD COLUMN IF NOT EXISTS dci_phon        TEXT,
+  ADD COLUMN IF NOT EXISTS search_tokens   TEXT[];
+
+ALTER TABLE IF EXISTS staging_non_renouveles
+  ADD COLUMN IF NOT EXISTS nom_marque_phon TEXT,
+  ADD COLUMN IF NOT EXISTS dci_phon        TEXT,
+  ADD COLUMN IF NOT EXISTS search_tokens   TEXT[];
+
+CREATE INDEX IF NOT EXISTS idx_enreg_marque_phon      ON enregistrements(nom_marque_phon);
+CREATE INDEX IF NOT EXISTS idx_enreg_dci_phon         ON enregistrements(dci_phon);
+CREATE INDEX IF NOT EXISTS idx_enreg_tokens           ON enregistrements USING gin(search_tokens);
+CREATE INDEX IF NOT EXISTS idx_retrait_marque_phon    ON retraits(nom_marque_phon);
+CREATE INDEX IF NOT EXISTS idx_retrait_dci_phon       ON retraits(dci_phon);
+CREATE INDEX IF NOT EXISTS idx_retrait_tokens         ON retraits USING gin(search_tokens);
+CREATE INDEX IF NOT EXISTS idx_nonrenouv_marque_phon  ON non_renouveles(nom_marque_phon);
+CREATE INDEX IF NOT EXISTS idx_nonrenouv_dci_phon     ON non_renouveles(dci_phon);
+CREATE INDEX IF NOT EXISTS idx_nonrenouv_tokens       ON non_renouveles USING gin(search_tokens);
+
+-- ─── Texte recherché par searchMedicaments() (lib/queries.ts) ─
+-- CONCAT_WS n'est que STABLE et ne peut pas servir d'expression d'index ;
+-- array_to_string saute les NULL de la même façon. non_renouveles n'a pas
+-- d'index : sa colonne date_final::TEXT dépend de DateStyle (table courte).
+CREATE OR REPLACE FUNCTION search_haystack(VARIADIC parts TEXT[])
+RETURNS TEXT LANGUAGE SQL IMMUTABLE PARALLEL SAFE AS $$
+  SELECT array_to_string(parts, ' ')
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_enreg_haystack_trgm ON enregistrements USING gin(
+  search_haystack(n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, annee::TEXT) gin_trgm_ops
+);
+CREATE INDEX IF NOT EXISTS idx_retrait_haystack_trgm ON retraits USING gin(
+  search_haystack(n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod, statut, motif_retrait) gin_trgm_ops
+);
+
+-- ─── search_medicaments : candidats indexés, puis score ───────
+-- L'ancienne version filtrait sur similarity(...) > 0.2 (aucun index utilisable) ;
+-- les opérateurs % sur dci et nom_marque gardent le même rappel en passant par l'index.
+-- query_phon / query_tokens : phoneticKey(q) et les tokens '~XXX' de textTokens(q).
+-- Sans eux, la fonction reste appelable comme avant : search_medicaments(q, scope, lim).
+-- Le recouvrement de tokens, très large, ne vaut que 0.1 et passe après les vrais résultats.
+DROP FUNCTION IF EXISTS search_medicaments(TEXT, TEXT, INTEGER);
+
+-- Seuil de l'opérateur % aligné sur l'ancien filtre similarity(...) > 0.2 (même
+-- rappel, via l'index GIN). Réglé sur la base et non par une clause SET de la
+-- fonction : celle-ci empêcherait l'inlining (EXPLAIN ne montrerait qu'un
+-- Function Scan). Sans les droits, le seuil par défaut (0.3) s'applique.
+DO $$
+BEGIN
+  EXECUTE format('ALTER DATABASE %I SET pg_trgm.similarity_threshold = 0.2', current_database());
+EXCEPTION WHEN insufficient_privilege THEN
+  RAISE NOTICE 'pg_trgm.similarity_threshold non modifiable : seuil par défaut conservé';
+END $$;
+-- ALTER DATABASE ne vaut que pour les sessions suivantes
+SET pg_trgm.similarity_threshold = 0.2;
+
+-- Une fois la fonction inlinée, le planificateur compte % au coût d'une simple
+-- comparaison et préfère un Seq Scan sur enregistrements (~25 ms contre ~9 ms
+-- via le BitmapOr sur 6000 lignes). Un coût réaliste lui fait choisir les index.
+DO $$
+BEGIN
+  ALTER FUNCTION similarity_op(TEXT, TEXT) COST 10;
+EXCEPTION WHEN insufficient_privilege THEN
+  RAISE NOTICE 'similarity_op non modifiable : coût par défaut conservé';
+END $$;
+
+CREATE OR REPLACE FUNCTION search_medicaments(
+  query TEXT,
+  scope TEXT DEFAULT 'all',
+  lim INTEGER DEFAULT 30,
+  query_phon TEXT DEFAULT NULL,
+  query_tokens TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (
+  source        TEXT,
+  id            INTEGER,
+  n_enreg       VARCHAR,
+  dci           TEXT,
+  nom_marque    TEXT,
+  forme         TEXT,
+  dosage        VARCHAR,
+  labo          TEXT,
+  pays          VARCHAR,
+  type_prod     VARCHAR,
+  statut        VARCHAR,
+  annee         SMALLINT,
+  date_retrait  DATE,
+  motif_retrait TEXT,
+  date_final    DATE,
+  similarity_score FLOAT
+) LANGUAGE SQL STABLE AS $$
+  -- match_tier : sous-chaîne (0), phonétique entière ou trigramme (1), tokens seuls (2)
+  SELECT source, id, n_enreg, dci, nom_marque, forme, dosage, labo, pays, type_prod,
+         statut, annee, date_retrait, motif_retrait, date_final, similarity_score
+  FROM (
+    SELECT 'enregistrement'::TEXT AS source, e.id, e.n_enreg, e.dci, e.nom_marque, e.forme, e.dosage,
+           e.labo, e.pays, e.type_prod, e.statut, e.annee,
+           NULL::DATE AS date_retrait, NULL::TEXT AS motif_retrait, e.date_final,
+           GREATEST(
+             similarity(e.dci, query), similarity(e.nom_marque, query),
+             CASE WHEN e.nom_marque_phon = query_phon OR e.dci_phon = query_phon THEN 0.8
+                  WHEN e.search_tokens && query_tokens THEN 0.1
+                  ELSE 0 END
+           )::FLOAT AS similarity_score,
+           CASE WHEN e.dci ILIKE '%' || query || '%' OR e.nom_marque ILIKE '%' || query || '%' THEN 0
+                WHEN e.nom_marque_phon = query_phon OR e.dci_phon = query_phon
+                  OR e.dci % query OR e.nom_marque % query THEN 1
+                ELSE 2 END AS match_tier
+    FROM enregistrements e
+    WHERE (scope = 'all' OR scope = 'enregistrement')
+      AND (e.nom_marque_phon = query_phon OR e.dci_phon = query_phon
+           OR e.search_tokens && query_tokens
+           OR e.dci ILIKE '%' || query || '%' OR e.nom_marque ILIKE '%' || query || '%'
+           OR e.dci % query OR e.nom_marque % query)
+
+    UNION ALL
+
+    SELECT 'retrait'::TEXT, r.id, r.n_enreg, r.dci, r.nom_marque, r.forme, r.dosage,
+           r.labo, r.pays, r.type_prod, r.statut, NULL::SMALLINT,
+           r.date_retrait, r.motif_retrait, NULL::DATE,
+           GREATEST(
+             similarity(r.dci, query), similarity(r.nom_marque, query),
+             CASE WHEN r.nom_marque_phon = query_phon OR r.dci_phon = query_phon THEN 0.8
+                  WHEN r.search_tokens && query_tokens THEN 0.1
+                  ELSE 0 END
+           )::FLOAT AS similarity_score,
+           CASE WHEN r.dci ILIKE '%' || query || '%' OR r.nom_marque ILIKE '%' || query || '%' THEN 0
+                WHEN r.nom_marque_phon = query_phon OR r.dci_phon = query_phon
+                  OR r.dci % query OR r.nom_marque % query THEN 1
+                ELSE 2 END AS match_tier
+    FROM retraits r
+    WHERE (scope = 'all' OR scope = 'retrait')
+      AND (r.nom_marque_phon = query_phon OR r.dci_phon = query_phon
+           OR r.search_tokens && query_tokens
+           OR r.dci ILIKE '%' || query || '%' OR r.nom_marque ILIKE '%' || query || '%'
+           OR r.dci % query OR r.nom_marque % query)
+
+    UNION ALL
+
+    SELECT 'non_renouvele'::TEXT, n.id, n.n_enreg, n.dci, n.nom_marque, n.forme, n.dosage,
+           n.labo, n.pays, n.type_prod, n.statut, NULL::SMALLINT,
+           NULL::DATE, NULL::TEXT, n.date_final,
+           GREATEST(
+             similarity(n.dci, query), similarity(n.nom_marque, query),
+             CASE WHEN n.nom_marque_phon = query_phon OR n.dci_phon = query_phon THEN 0.8
+                  WHEN n.search_tokens && query_tokens THEN 0.1
+                  ELSE 0 END
+           )::FLOAT AS similarity_score,
+           CASE WHEN n.dci ILIKE '%' || query || '%' OR n.nom_marque ILIKE '%' || query || '%' THEN 0
+                WHEN n.nom_marque_phon = query_phon OR n.dci_phon = query_phon
+                  OR n.dci % query OR n.nom_marque % query THEN 1
+                ELSE 2 END AS match_tier
+    FROM non_renouveles n
+    WHERE (scope = 'all' OR scope = 'non_renouvele')
+      AND (n.nom_marque_phon = query_phon OR n.dci_phon = query_phon
+           OR n.search_tokens && query_tokens
+           OR n.dci ILIKE '%' || query || '%' OR n.nom_marque ILIKE '%' || query || '%'
+           OR n.dci % query OR n.nom_marque % query)
+  ) AS unified_results
+  ORDER BY match_tier, similarity_score DESC
+  LIMIT lim;
+$$;
+
+COMMENT ON COLUMN enregistrements.search_tokens IS
+  'Mots normalisés de nom_marque + dci et squelettes phonétiques préfixés par ~ (scripts/phonetic.py)';